@@ -0,0 +1,337 @@
+"""The match/click/loot logic of one automation group, without any widgets.
+
+``AutomationGroup`` holds a group's templates and settings and does everything
+the shared ``AutomationScheduler`` asks of a group: matching frames, queueing
+clicks, following the state machine, waiting for post-click conditions and
+counting loot. The window's ``AutomationGroupWidget`` builds on it, and
+``run_automation.py`` drives it headless. Progress is reported through the
+``on_*`` methods, which are called from the scheduler's threads and do nothing
+unless a subclass overrides them.
+"""
+import time
+from threading import Thread
+
+import numpy as np
+
+from automation_scheduler import (
+    FOLLOW_UP_TIMEOUT, MAX_REUSE_SECONDS, POST_CLICK_APPEAR, POST_CLICK_POLL_INTERVAL, POST_CLICK_TIMEOUT,
+    AutomationScheduler
+)
+from profiling import StageProfiler
+from template_matching import (
+    Matcher, concatenate_hits, distinct_instances, match_in_region, signatures_match, topmost_hit
+)
+
+
+def normalize_automation_template(entry):
+    """Convert a saved automation template to the {"templates": [...], "settings": {...}, "states": {...}} form.
+
+    Older files stored a plain list of image paths per template name. Templates
+    without a state machine have an empty "states" dict and no "initial_state".
+    """
+    if isinstance(entry, list):
+        return {"templates": entry, "settings": {}, "states": {}, "initial_state": None}
+    entry.setdefault("templates", [])
+    entry.setdefault("settings", {})
+    entry.setdefault("states", {})
+    entry.setdefault("initial_state", None)
+    return entry
+
+
+class AutomationGroup:
+    """One automation group: a template list (or state machine) clicked in order, plus loot to count."""
+
+    def __init__(self, group_name, confidence_threshold, template_store=None, capture_backend=None,
+                 match_pool=None, scheduler=None, template_stats=None):
+        self.group_name = group_name
+        # Threshold, match mode, pools and the per-template settings saved with the automation template
+        self.matcher = Matcher(
+            confidence_threshold, template_store=template_store, template_stats=template_stats, match_pool=match_pool
+        )
+        self.profiler = StageProfiler()  # Per-stage timings of the ticks this group handled
+        self.matcher.profiler = self.profiler
+        self.capture_backend = capture_backend
+        self.scheduler = scheduler if scheduler is not None else AutomationScheduler(self.capture_backend)
+        self.priority = 0  # Groups with a higher priority get their clicks performed first
+        self.awaiting_clicks = False  # Clicks are queued with the scheduler and not yet performed
+        self.pending_template = None  # Template whose clicks are queued
+        self.pending_template_index = None  # Its position in self.templates, when not running a state machine
+        self.pending_locations = None
+        self.pass_position = 0  # Index of the next template to try in the current pass
+        self.follow_up_until = 0  # time.time() until which the group waits for the screen to react to a click
+        self.last_clicks = None  # (template_path, locations) of the latest performed clicks
+        self.waiting_post_click = False  # A clicked template's post-click condition is being polled
+        self.resume_at = 0  # time.time() before which the group skips frames (after loot detection)
+        self.last_match = None  # (frame signature, match key, {path: hits}, time matched) of the last matched frame
+        self.frames_processed = 0
+        self.frames_skipped = 0  # Frames identical to the previous one, answered from last_match
+        self.templates = []
+        # {"state_name": {"templates": [paths looked for in this state], "transitions": {path: state after its click}}}
+        self.states = {}
+        self.initial_state = None
+        self.current_state = None  # State of the running state machine
+        # Besides the matcher's options, self.matcher.template_settings holds each template's
+        # "post_click": {"until": "disappear" or "appear", "template": path, "timeout": seconds}
+        self.loot_templates = []  # Desired loot image templates
+        self.loot_counts = {}  # Counts for each loot
+        self.loot_targets = {}  # {"loot_template_path": target_count}
+        self.loot_detected = False  # Whether the latest matched frame showed any loot
+        self.detection_delay = 2.5  # Seconds to wait after loot detection
+        self.running = False
+        self.click_all_instances = False  # Click every instance of a template found in a frame
+        self.frame_seq = 0  # Sequence number of the latest captured frame
+        self.start_time = None
+        self.timer_started = False  # To track if the timer has started
+
+    def load_automation_template(self, entry):
+        """Use the templates, settings and states of a saved automation template."""
+        entry = normalize_automation_template(entry)
+        self.templates = list(entry["templates"])
+        self.matcher.template_settings = {path: dict(settings) for path, settings in entry["settings"].items()}
+        self.states = {
+            name: {"templates": list(state["templates"]), "transitions": dict(state.get("transitions", {}))}
+            for name, state in entry["states"].items()
+        }
+        self.initial_state = entry["initial_state"]
+        self.matcher.load_templates(self.templates)
+
+    def start(self):
+        """Reset the run state and hand the group to the scheduler."""
+        self.running = True
+        self.timer_started = False  # Reset the timer
+        self.awaiting_clicks = False
+        self.resume_at = 0
+        self.pass_position = 0
+        self.follow_up_until = 0
+        self.last_clicks = None
+        self.waiting_post_click = False
+        self.current_state = None
+        if self.states:
+            self.current_state = self.initial_state if self.initial_state in self.states else next(iter(self.states))
+        self.last_match = None
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.profiler.reset()
+        self.scheduler.register(self)  # The shared scheduler captures frames and performs clicks
+
+    def stop(self):
+        """Take the group off the scheduler and save what was learned about its templates."""
+        self.running = False
+        self.scheduler.unregister(self)
+        self.matcher.template_stats.save()
+
+    def on_frame(self, frame, seconds, matched):
+        """A frame was handled in ``seconds``; ``matched`` is False when earlier results were reused."""
+
+    def on_state_changed(self):
+        """The state machine moved to ``current_state``."""
+
+    def on_loot(self, loot_path):
+        """A loot template was seen and counted."""
+
+    def on_target_reached(self, loot_path):
+        """A loot target was reached and the group stopped running."""
+
+    def on_error(self, error):
+        """Matching, capturing or clicking failed and the group stopped running."""
+
+    def wants_frame(self):
+        """Whether the scheduler should hand this group the next frame."""
+        return (self.running and not self.awaiting_clicks and not self.waiting_post_click
+                and time.time() >= self.resume_at)
+
+    def process_frame(self, frame):
+        """Match this group's templates against a frame from the scheduler and queue any clicks."""
+        start = time.perf_counter()
+        self.frame_seq = frame.seq
+        candidates = self.click_candidates()
+        # Rarely seen click templates sit most frames out; loot is always looked for
+        remaining = [path for path in candidates if self.matcher.template_stats.should_probe(path)]
+        template_paths = remaining + self.loot_templates
+        # Keyed on every candidate, so which ones sit a frame out does not stop the results being reused
+        key = self.match_key(candidates + self.loot_templates)
+        hits_by_path = self.cached_results(frame, key)
+        matched = hits_by_path is None
+        if matched:
+            # Click and loot templates are matched together; results come back in template order
+            hits_by_path = dict(zip(template_paths, self.matcher.match(frame, template_paths)))
+            self.last_match = (frame.signature(), key, hits_by_path, time.time())
+            self.frames_processed += 1
+        else:
+            self.frames_skipped += 1
+        self.profiler.record_all(frame.timings)
+        self.on_frame(frame, time.perf_counter() - start, matched)
+        start = time.perf_counter()
+        self.queue_clicks(frame, candidates, hits_by_path)
+        self.profiler.record("candidates", time.perf_counter() - start)
+
+    def queue_clicks(self, frame, candidates, hits_by_path):
+        """Count loot in the match results and queue the clicks of the first candidate that was found.
+
+        Candidates without hits in ``hits_by_path`` sat out the frame they were matched on.
+        """
+        if not self.check_loot([hits_by_path[path] for path in self.loot_templates]):
+            return
+        following_up = time.time() < self.follow_up_until
+        for index, template_path in enumerate(candidates):
+            if template_path not in hits_by_path:
+                continue
+            locations = self.click_locations(hits_by_path[template_path])
+            if following_up and (template_path, locations) == self.last_clicks:
+                continue  # The screen has not caught up with the click yet
+            if locations:
+                if not self.timer_started:
+                    self.timer_started = True
+                    self.start_time = time.time()  # Start timer on first detection
+                self.pending_template = template_path
+                self.pending_template_index = self.pass_position + index if self.current_state is None else None
+                self.pending_locations = locations
+                self.awaiting_clicks = True
+                self.scheduler.request_clicks(self, locations, frame.seq)
+                return
+        if not following_up:
+            self.pass_position = 0  # Nothing left to click in this pass, start again from the first template
+
+    def click_candidates(self):
+        """Templates that may be clicked this tick: the current state's, or the rest of the pass."""
+        state = self.states.get(self.current_state)
+        if state is not None:
+            return state["templates"]
+        return self.templates[self.pass_position:]
+
+    def enter_state(self, template_path):
+        """Follow the transition of the current state for a clicked template."""
+        state = self.states.get(self.current_state, {"transitions": {}})
+        next_state = state["transitions"].get(template_path)
+        if next_state in self.states:
+            self.current_state = next_state
+            self.on_state_changed()
+
+    def match_key(self, template_paths):
+        """Everything besides the screen content that the match results depend on."""
+        return tuple(template_paths), self.matcher.threshold, self.matcher.match_mode, self.matcher.downscale
+
+    def cached_results(self, frame, key):
+        """Return the previous ``{template_path: hits}`` if the screen has not changed since they were matched.
+
+        Results are only reused for ``MAX_REUSE_SECONDS``, so a change too small to
+        show in the coarse copies is still picked up by the next real match.
+        """
+        if self.last_match is None:
+            return None
+        signature, last_key, hits_by_path, matched_at = self.last_match
+        if last_key != key or time.time() - matched_at >= MAX_REUSE_SECONDS:
+            return None
+        if not signatures_match(signature, frame.signature()):
+            return None
+        return hits_by_path
+
+    def clicks_done(self, executed):
+        """Called by the scheduler once queued clicks were performed, or dropped as stale."""
+        if executed:
+            template_path = self.pending_template
+            # Until the follow-up template shows up, frames still showing the clicked one are not clicked again
+            self.follow_up_until = time.time() + FOLLOW_UP_TIMEOUT
+            self.last_clicks = (template_path, self.pending_locations)
+            condition = self.matcher.template_settings.get(template_path, {}).get("post_click")
+            if condition:
+                self.waiting_post_click = True
+                Thread(
+                    target=self.wait_for_post_click, args=(template_path, self.pending_locations, condition),
+                    daemon=True
+                ).start()
+            if self.pending_template_index is None:
+                self.enter_state(template_path)
+            else:
+                # Like a pass of the old loop, carry on with the templates after the clicked one
+                self.pass_position = self.pending_template_index + 1
+                if self.pass_position >= len(self.templates):
+                    self.pass_position = 0
+        self.awaiting_clicks = False
+
+    def wait_for_post_click(self, template_path, locations, condition):
+        """Poll the relevant part of the screen until the clicked template's post-click condition holds."""
+        deadline = time.time() + condition.get("timeout", POST_CLICK_TIMEOUT)
+        try:
+            while self.running and time.time() < deadline:
+                if self.post_click_condition_met(template_path, locations, condition):
+                    self.follow_up_until = 0  # The screen has reacted, the next frame can be trusted
+                    break
+                time.sleep(POST_CLICK_POLL_INTERVAL)
+        except Exception as e:
+            self.automation_failed(e)
+        finally:
+            self.waiting_post_click = False
+            self.scheduler.speed_up()
+
+    def post_click_condition_met(self, template_path, locations, condition):
+        """Check a post-click condition once, capturing only the area it depends on."""
+        if condition["until"] == POST_CLICK_APPEAR:
+            follow_up = condition["template"]
+            roi = self.matcher.search_region(follow_up)
+            return len(self.poll_template(follow_up, [roi] if roi is not None else None)) > 0
+        # Only look at the clicked spots, with room for the largest scale of the template
+        height, width = self.matcher.template_store.get(template_path).shape
+        scale = max(self.matcher.template_scales(template_path))
+        width, height = int(width * scale), int(height * scale)
+        rois = [[x - width, y - height, 2 * width, 2 * height] for x, y in locations]
+        hits = self.poll_template(template_path, rois)
+        for x, y in locations:
+            near = (np.abs(hits["x"] - x) <= hits["width"] // 2) & (np.abs(hits["y"] - y) <= hits["height"] // 2)
+            if np.any(near):
+                return False
+        return True
+
+    def poll_template(self, template_path, rois):
+        """Capture ``rois`` and return the hits of one template in them, bypassing search-region learning."""
+        frame = self.capture_backend.poll(rois)
+        scales = self.matcher.template_scales(template_path)
+        scaled_templates = self.matcher.template_store.get_scaled(template_path, scales)
+        return concatenate_hits([
+            match_in_region(region, None, scaled_templates, None, None, self.matcher.threshold)
+            for region in frame.regions
+        ])
+
+    def check_loot(self, loot_results):
+        """Count detected loot and notify; returns False once a loot target stops the automation."""
+        loot_detected = False
+        for loot_path, loot_hits in zip(self.loot_templates, loot_results):
+            if len(loot_hits):
+                loot_detected = True
+                self.loot_counts[loot_path] = self.loot_counts.get(loot_path, 0) + 1
+                self.loot_detected = True
+                self.on_loot(loot_path)
+                if loot_path in self.loot_targets and self.loot_counts[loot_path] >= self.loot_targets[loot_path]:
+                    self.running = False
+                    self.on_target_reached(loot_path)
+                    return False
+        if loot_detected:
+            self.resume_at = time.time() + self.detection_delay  # Wait for detection delay after loot detection
+        self.loot_detected = loot_detected
+        return True
+
+    def automation_failed(self, error):
+        """Stop this group after an error in the scheduler's threads."""
+        self.running = False
+        self.on_error(error)
+
+    def capture_regions(self):
+        """Return the search regions of this tick's click and loot templates, or None if any needs the whole desktop."""
+        rois = []
+        for template_path in self.click_candidates() + self.loot_templates:
+            roi = self.matcher.search_region(template_path)
+            if roi is None:
+                return None
+            rois.append(roi)
+        return rois
+
+    def click_locations(self, hits, all_instances=None):
+        """Turn hits into the locations to click: every instance, or only the topmost one."""
+        if all_instances is None:
+            all_instances = self.click_all_instances
+        if all_instances:
+            hits = distinct_instances(hits)
+        else:
+            hit = topmost_hit(hits)
+            hits = hits[:0] if hit is None else hit.reshape(1)
+        return [(int(x), int(y)) for x, y in zip(hits["x"], hits["y"])]
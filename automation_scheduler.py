@@ -0,0 +1,216 @@
+"""One capture/match loop and one input queue shared by every running automation group.
+
+Groups register with the scheduler instead of running their own loops. Each
+tick the scheduler captures the union of what the groups need once, hands the
+frame to every group that is ready for one, and performs the clicks the groups
+ask for on a single input thread, highest group priority first.
+
+Instead of fixed sleeps the loop paces itself: it captures at ``target_fps``
+while the screen changes or right after a click, and backs off towards
+``min_fps`` while consecutive frames stay the same and no group is waiting
+for the screen to react to a click.
+
+A group only needs these members: ``running``, ``priority``, ``follow_up_until``,
+``waiting_post_click``, ``wants_frame()``, ``capture_regions()``,
+``process_frame(frame)``, ``clicks_done(executed)`` and ``automation_failed(error)``.
+"""
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+
+from template_matching import signatures_match
+
+TARGET_FPS = 10.0  # Capture rate while the screen is changing or a click was just made
+MIN_FPS = 1.0  # Slowest rate a static screen backs off to
+BACKOFF_FACTOR = 1.5  # Growth of the tick interval per unchanged frame
+CLICK_INTERVAL = 0.1  # Seconds between the clicks of one request
+FOLLOW_UP_TIMEOUT = 1.0  # Seconds a group waits for the screen to react to its click
+POST_CLICK_TIMEOUT = 3.0  # Default seconds a post-click condition is waited for
+POST_CLICK_POLL_INTERVAL = 0.02  # Seconds between checks of a post-click condition
+POST_CLICK_DISAPPEAR = "disappear"  # Post-click condition: the clicked template is gone
+POST_CLICK_APPEAR = "appear"  # Post-click condition: a follow-up template is on screen
+RATE_WINDOW = 5.0  # Seconds of ticks the achieved frame rate is measured over
+IDLE_DELAY = 0.05  # Seconds to wait when no group is ready for a frame
+MAX_REUSE_SECONDS = 2.0  # Longest a group reuses the results of an unchanged screen before matching again
+
+
+class AutomationScheduler:
+    """Captures once per tick for all groups and serializes their clicks."""
+
+    def __init__(self, capture_backend, click=None, target_fps=TARGET_FPS, min_fps=MIN_FPS):
+        self.capture_backend = capture_backend
+        self.groups = []
+        self.frame_seq = 0  # Sequence number of the latest captured frame
+        self.capture_seconds = 0.0  # How long the latest capture took
+        self._slept = 0.0  # Seconds waited since the latest capture, handed to the next frame as its "sleep" stage
+        self.target_fps = target_fps
+        self.min_fps = min_fps
+        self.interval = 1.0 / target_fps  # Current seconds between ticks
+        self._tick_times = deque()  # time.perf_counter() of recent ticks, for achieved_fps
+        self._last_signature = None
+        self._wake = threading.Event()  # Cuts the wait before the next tick short, e.g. after a click
+        self._click = click
+        self._clicks = queue.PriorityQueue()
+        self._click_order = itertools.count()
+        self._stale_frame_seq = 0  # Click requests from frames up to this one were captured before a click
+        self._lock = threading.Lock()
+        self._stopping = False  # Set by stop(); both loops return at their next check
+        self._thread = None
+        self._input_thread = None
+
+    def register(self, group):
+        """Start driving a group; starts the loop threads if they are not running."""
+        with self._lock:
+            if group not in self.groups:
+                self.groups.append(group)
+            self._stopping = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self.automation_loop, daemon=True)
+                self._thread.start()
+            if self._input_thread is None:
+                self._input_thread = threading.Thread(target=self.input_loop, daemon=True)
+                self._input_thread.start()
+
+    def unregister(self, group):
+        """Stop driving a group."""
+        with self._lock:
+            if group in self.groups:
+                self.groups.remove(group)
+
+    def stop(self):
+        """Stop both loop threads and wait until the current tick and click are finished.
+
+        Call this before shutting down the match pool or closing the capture
+        backend, which a running tick may still be using.
+        """
+        with self._lock:
+            self._stopping = True
+            thread, input_thread = self._thread, self._input_thread
+        self._wake.set()
+        if input_thread is not None:
+            self._clicks.put((float("-inf"), next(self._click_order), 0, None, None))  # Wakes the input loop
+        for running_thread in (thread, input_thread):
+            if running_thread is not None and running_thread is not threading.current_thread():
+                running_thread.join()
+        while not self._clicks.empty():
+            self._clicks.get_nowait()  # Clicks that were still queued are dropped
+
+    def request_clicks(self, group, locations, frame_seq):
+        """Queue clicks a group found in frame ``frame_seq``; the group hears back via clicks_done."""
+        self._clicks.put((-group.priority, next(self._click_order), frame_seq, group, locations))
+
+    def set_target_fps(self, fps):
+        """Change the frame rate to aim for."""
+        self.target_fps = fps
+        self.speed_up()
+
+    def speed_up(self):
+        """Go back to the target rate and start the next tick right away."""
+        self.interval = 1.0 / self.target_fps
+        self._wake.set()
+
+    def achieved_fps(self):
+        """Frames captured per second over the last few seconds."""
+        ticks = list(self._tick_times)
+        if len(ticks) < 2 or time.perf_counter() - ticks[-1] > RATE_WINDOW:
+            return 0.0
+        return (len(ticks) - 1) / (ticks[-1] - ticks[0])
+
+    def capture_regions(self, groups):
+        """Combine the search regions of every group, or None if any group needs whole monitors."""
+        rois = []
+        for group in groups:
+            group_rois = group.capture_regions()
+            if group_rois is None:
+                return None
+            rois.extend(group_rois)
+        return rois
+
+    def automation_loop(self):
+        """Capture once per tick and hand the frame to every group that is ready for one."""
+        while True:
+            with self._lock:
+                self.groups = [group for group in self.groups if group.running]
+                if not self.groups or self._stopping:
+                    self._thread = None
+                    return
+                groups = sorted(self.groups, key=lambda group: -group.priority)
+            ready = [group for group in groups if group.wants_frame()]
+            if not ready:
+                time.sleep(IDLE_DELAY)
+                self._slept += IDLE_DELAY
+                continue
+            tick_start = time.perf_counter()
+            self._wake.clear()
+            try:
+                frame = self.capture_backend.capture(self.capture_regions(ready))
+            except Exception as e:
+                for group in ready:
+                    group.automation_failed(e)
+                continue
+            self.capture_seconds = time.perf_counter() - tick_start
+            frame.timings["sleep"] = self._slept
+            self._slept = 0.0
+            self.frame_seq = frame.seq
+            self.record_tick(tick_start, frame, groups)
+            for group in ready:
+                try:
+                    group.process_frame(frame)
+                except Exception as e:
+                    group.automation_failed(e)
+            wait_start = time.perf_counter()
+            self._wake.wait(max(0.0, tick_start + self.interval - wait_start))
+            self._slept += time.perf_counter() - wait_start
+
+    def record_tick(self, tick_start, frame, groups):
+        """Track the achieved rate and slow down while the screen stays the same."""
+        self._tick_times.append(tick_start)
+        while self._tick_times[0] < tick_start - RATE_WINDOW:
+            self._tick_times.popleft()
+        signature = frame.signature()
+        now = time.time()
+        # The screen may not have caught up with a click yet, so keep looking at full rate
+        reacting = any(group.waiting_post_click or now < group.follow_up_until for group in groups)
+        if not reacting and signatures_match(self._last_signature, signature):
+            # A target below min_fps is never backed off from; min_fps itself is kept for when the target rises
+            self.interval = min(1.0 / min(self.min_fps, self.target_fps), self.interval * BACKOFF_FACTOR)
+        else:
+            self.interval = 1.0 / self.target_fps
+        self._last_signature = signature
+
+    def input_loop(self):
+        """Perform queued clicks one group at a time, dropping requests made stale by earlier clicks."""
+        while True:
+            _, _, frame_seq, group, locations = self._clicks.get()
+            if group is None:  # Put there by stop()
+                with self._lock:
+                    self._input_thread = None
+                return
+            executed = False
+            if group.running and frame_seq > self._stale_frame_seq:
+                try:
+                    for click_index, location in enumerate(locations):
+                        if click_index:
+                            time.sleep(CLICK_INTERVAL)
+                        self.click(*location)
+                    executed = True
+                except Exception as e:
+                    group.automation_failed(e)
+                # Anything captured up to now shows the screen from before these clicks took effect
+                self._stale_frame_seq = self.frame_seq
+            group.clicks_done(executed)
+            if executed:
+                self.speed_up()  # Poll quickly until the group sees the screen react
+
+    def click_function(self):
+        """Return the function clicks are made with, importing pyautogui the first time it is needed."""
+        if self._click is None:
+            import pyautogui
+            self._click = pyautogui.click
+        return self._click
+
+    def click(self, x, y):
+        """Click at a desktop position with pyautogui unless another click function was given."""
+        self.click_function()(x, y)
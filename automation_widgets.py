@@ -0,0 +1,870 @@
+"""The widgets of the app that are built on the matching code.
+
+``AutomationGroupWidget`` is the tab of one automation group, with
+``ScreenCaptureWidget`` for picking screen regions and ``NotificationPlayer``
+for loot sounds. Importing this module loads NumPy and OpenCV through the
+matching modules, so the app (9thfeb2025) imports it on a background thread
+once its window is already on screen.
+"""
+import json
+import os
+import time
+from threading import Lock, Thread
+
+from PyQt5.QtCore import Q_ARG, QMetaObject, QPoint, QRect, QSize, Qt, pyqtSlot
+from PyQt5.QtGui import QIcon
+from PyQt5.QtWidgets import (
+    QApplication, QCheckBox, QComboBox, QFileDialog, QHBoxLayout, QInputDialog, QLabel, QLineEdit, QListWidget,
+    QListWidgetItem, QMessageBox, QPushButton, QRubberBand, QSpinBox, QVBoxLayout, QWidget
+)
+
+from automation_group import AutomationGroup
+from automation_scheduler import POST_CLICK_APPEAR, POST_CLICK_DISAPPEAR, POST_CLICK_TIMEOUT
+from capture_backends import QtCaptureBackend
+from template_matching import DEFAULT_SCALES, normalize_scales
+
+
+class NotificationPlayer:
+    """Plays MP3 loot notifications for every group.
+
+    pygame is slow to import and its mixer slow to start, so both happen on the
+    first notification, or earlier on a background thread through ``mixer()``.
+    """
+
+    def __init__(self):
+        self._mixer = None
+        self._lock = Lock()
+
+    def mixer(self):
+        """Return pygame's mixer, importing pygame and starting the mixer the first time."""
+        with self._lock:
+            if self._mixer is None:
+                import pygame  # For playing MP3 sound notifications
+                pygame.mixer.init()
+                self._mixer = pygame.mixer
+        return self._mixer
+
+    def play(self, mp3_file):
+        """Play an MP3 file."""
+        mixer = self.mixer()
+        mixer.music.load(mp3_file)
+        mixer.music.play()
+
+
+class ScreenCaptureWidget(QWidget):
+    def __init__(self, on_region_selected=None):
+        super().__init__()
+        self.on_region_selected = on_region_selected  # Called with the selected QRect instead of saving a file
+        self.setWindowTitle('Screen Capture')
+        self.setWindowState(Qt.WindowFullScreen)
+        self.setWindowOpacity(0.3)
+        self.rubberBand = QRubberBand(QRubberBand.Rectangle, self)
+        self.origin = QPoint()
+
+    def mousePressEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.origin = event.pos()
+            self.rubberBand.setGeometry(QRect(self.origin, QSize()))
+            self.rubberBand.show()
+
+    def mouseMoveEvent(self, event):
+        if not self.origin.isNull():
+            self.rubberBand.setGeometry(QRect(self.origin, event.pos()).normalized())
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.LeftButton:
+            self.rubberBand.hide()
+            rect = self.rubberBand.geometry()
+            if self.on_region_selected:
+                self.close()
+                self.on_region_selected(QRect(self.mapToGlobal(rect.topLeft()), rect.size()))
+                return
+            self.capture_screen(rect)
+            self.close()
+
+    def capture_screen(self, rect):
+        screen = QApplication.primaryScreen()
+        screenshot = screen.grabWindow(0, rect.x(), rect.y(), rect.width(), rect.height())
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Screenshot", "", "PNG Files (*.png);;All Files (*)")
+        if file_path:
+            screenshot.save(file_path, 'png')
+
+
+class AutomationGroupWidget(AutomationGroup, QWidget):
+    def __init__(self, group_name, confidence_threshold, automation_templates, template_store=None,
+                 capture_backend=None, match_pool=None, scheduler=None, template_stats=None,
+                 notification_player=None):
+        QWidget.__init__(self)
+        AutomationGroup.__init__(
+            self, group_name, confidence_threshold, template_store,
+            capture_backend if capture_backend is not None else QtCaptureBackend(), match_pool, scheduler,
+            template_stats
+        )
+        self.automation_templates = automation_templates
+        self.mp3_file = None  # Notification sound file
+        self.loot_notifications = {}  # {"loot_template_path": "mp3_file_path"}
+        self.loot_detection_templates = {}  # {"TemplateName": {"loot_template_path": "mp3_file_path"}}
+        self.load_saved_loot_detection_templates()
+        self.notification_player = notification_player if notification_player is not None else NotificationPlayer()
+
+        # Layout
+        layout = QVBoxLayout()
+
+        # Template management
+        template_name_layout = QHBoxLayout()
+        self.template_name_input = QLineEdit()
+        self.template_name_input.setPlaceholderText("Enter automation template name")
+        template_name_layout.addWidget(self.template_name_input)
+
+        self.template_dropdown = QComboBox()
+        self.template_dropdown.addItem("Create New Template")
+        self.template_dropdown.addItems(self.automation_templates.keys())
+        self.template_dropdown.currentIndexChanged.connect(self.load_automation_template_from_dropdown)
+        template_name_layout.addWidget(self.template_dropdown)
+
+        layout.addLayout(template_name_layout)
+
+        # Status and stats
+        status_layout = QHBoxLayout()
+        self.status_label = QLabel("Status: Stopped")
+        status_layout.addWidget(self.status_label)
+        self.timing_button = QPushButton("Show Timings")
+        self.timing_button.setCheckable(True)
+        self.timing_button.toggled.connect(self.toggle_timing_panel)
+        status_layout.addWidget(self.timing_button)
+        layout.addLayout(status_layout)
+
+        # Per-stage timings of recent ticks, collapsed until asked for
+        self.timing_panel = QWidget()
+        timing_panel_layout = QVBoxLayout(self.timing_panel)
+        timing_panel_layout.setContentsMargins(0, 0, 0, 0)
+        self.timing_label = QLabel(self.profiler.report())
+        self.timing_label.setStyleSheet("font-family: monospace;")
+        timing_panel_layout.addWidget(self.timing_label)
+        timing_buttons_layout = QHBoxLayout()
+        export_timings_button = QPushButton("Export Timings CSV")
+        export_timings_button.clicked.connect(self.export_timings)
+        timing_buttons_layout.addWidget(export_timings_button)
+        reset_timings_button = QPushButton("Reset Timings")
+        reset_timings_button.clicked.connect(self.reset_timings)
+        timing_buttons_layout.addWidget(reset_timings_button)
+        timing_panel_layout.addLayout(timing_buttons_layout)
+        self.timing_panel.setVisible(False)
+        layout.addWidget(self.timing_panel)
+        self.time_label = QLabel("Time Elapsed: 00:00:00")
+        layout.addWidget(self.time_label)
+        self.frame_stats_label = QLabel("Frames: 0 matched, 0 unchanged | 0.0 of 0.0 fps")
+        layout.addWidget(self.frame_stats_label)
+        self.state_label = QLabel("State: -")
+        layout.addWidget(self.state_label)
+
+        # Loot detection
+        loot_status_layout = QHBoxLayout()
+        self.loot_status_label = QLabel("Loot Detected: No")
+        loot_status_layout.addWidget(self.loot_status_label)
+
+        # Loot detection buttons
+        loot_buttons_layout = QHBoxLayout()
+        upload_loot_button = QPushButton("Upload Loot Image")
+        upload_loot_button.clicked.connect(self.upload_loot_template)
+        loot_buttons_layout.addWidget(upload_loot_button)
+
+        remove_loot_button = QPushButton("Remove Selected Loot")
+        remove_loot_button.clicked.connect(self.remove_selected_loot)
+        loot_buttons_layout.addWidget(remove_loot_button)
+
+        upload_mp3_button = QPushButton("Upload MP3 Notification")
+        upload_mp3_button.clicked.connect(self.upload_mp3_file)
+        loot_buttons_layout.addWidget(upload_mp3_button)
+
+        set_target_button = QPushButton("Set Loot Target")
+        set_target_button.clicked.connect(self.set_loot_target)
+        loot_buttons_layout.addWidget(set_target_button)
+
+        save_notification_button = QPushButton("Save Notification")
+        save_notification_button.clicked.connect(self.save_notification)
+        loot_buttons_layout.addWidget(save_notification_button)
+
+        layout.addLayout(loot_status_layout)
+        layout.addLayout(loot_buttons_layout)
+
+        # New white box for loot images and MP3
+        self.loot_list = QListWidget()
+        layout.addWidget(QLabel("Loot Images and MP3 File:"))
+        layout.addWidget(self.loot_list)
+
+        # Checkbox to toggle loot list visibility
+        self.hide_preview_checkbox = QCheckBox("Hide Image Preview")
+        self.hide_preview_checkbox.stateChanged.connect(self.update_loot_list)
+        layout.addWidget(self.hide_preview_checkbox)
+
+        # Loot detection template management
+        loot_template_name_layout = QHBoxLayout()
+        self.loot_template_name_input = QLineEdit()
+        self.loot_template_name_input.setPlaceholderText("Enter loot detection template name")
+        loot_template_name_layout.addWidget(self.loot_template_name_input)
+
+        self.loot_template_dropdown = QComboBox()
+        self.loot_template_dropdown.addItem("Create New Template")
+        self.loot_template_dropdown.addItems(self.loot_detection_templates.keys())
+        self.loot_template_dropdown.currentIndexChanged.connect(self.load_loot_detection_template_from_dropdown)
+        loot_template_name_layout.addWidget(self.loot_template_dropdown)
+
+        layout.addLayout(loot_template_name_layout)
+
+        save_loot_template_button = QPushButton("Save Loot Template")
+        save_loot_template_button.clicked.connect(self.save_loot_detection_template)
+        layout.addWidget(save_loot_template_button)
+
+        delete_loot_template_button = QPushButton("Delete Loot Template")
+        delete_loot_template_button.clicked.connect(self.delete_loot_detection_template)
+        layout.addWidget(delete_loot_template_button)
+
+        # Template list with title
+        layout.addWidget(QLabel("Automation Templates:"))
+        self.template_list = QListWidget()
+        layout.addWidget(self.template_list)
+
+        # Buttons
+        button_layout = QHBoxLayout()
+        upload_button = QPushButton("Upload Template")
+        upload_button.clicked.connect(self.upload_template)
+        button_layout.addWidget(upload_button)
+
+        remove_button = QPushButton("Remove Selected Template")
+        remove_button.clicked.connect(self.remove_selected_template)
+        button_layout.addWidget(remove_button)
+
+        save_button = QPushButton("Save Template")
+        save_button.clicked.connect(self.save_automation_template)
+        button_layout.addWidget(save_button)
+
+        delete_button = QPushButton("Delete Template")
+        delete_button.clicked.connect(self.delete_automation_template)
+        button_layout.addWidget(delete_button)
+
+        scales_button = QPushButton("Set Template Scales")
+        scales_button.clicked.connect(self.set_template_scales)
+        button_layout.addWidget(scales_button)
+
+        downscale_button = QPushButton("Set Match Downscale")
+        downscale_button.clicked.connect(self.set_template_downscale)
+        button_layout.addWidget(downscale_button)
+
+        post_click_button = QPushButton("Set Post-Click Condition")
+        post_click_button.clicked.connect(self.set_post_click_condition)
+        button_layout.addWidget(post_click_button)
+
+        layout.addLayout(button_layout)
+
+        # Search regions
+        region_layout = QHBoxLayout()
+        region_button = QPushButton("Set Search Region")
+        region_button.clicked.connect(self.set_search_region)
+        region_layout.addWidget(region_button)
+
+        clear_region_button = QPushButton("Clear Search Region")
+        clear_region_button.clicked.connect(self.clear_search_region)
+        region_layout.addWidget(clear_region_button)
+
+        self.auto_roi_checkbox = QCheckBox("Auto-Learn Search Regions")
+        self.auto_roi_checkbox.stateChanged.connect(
+            lambda state: setattr(self.matcher, "auto_learn_roi", state == Qt.Checked)
+        )
+        region_layout.addWidget(self.auto_roi_checkbox)
+
+        layout.addLayout(region_layout)
+
+        # State machine
+        state_layout = QHBoxLayout()
+        add_to_state_button = QPushButton("Add to State")
+        add_to_state_button.clicked.connect(self.add_to_state)
+        state_layout.addWidget(add_to_state_button)
+
+        transition_button = QPushButton("Set Transition")
+        transition_button.clicked.connect(self.set_state_transition)
+        state_layout.addWidget(transition_button)
+
+        initial_state_button = QPushButton("Set Initial State")
+        initial_state_button.clicked.connect(self.set_initial_state)
+        state_layout.addWidget(initial_state_button)
+
+        clear_states_button = QPushButton("Clear States")
+        clear_states_button.clicked.connect(self.clear_states)
+        state_layout.addWidget(clear_states_button)
+
+        layout.addLayout(state_layout)
+
+        self.click_all_checkbox = QCheckBox("Click All Instances Before Re-Capturing")
+        self.click_all_checkbox.stateChanged.connect(
+            lambda state: setattr(self, "click_all_instances", state == Qt.Checked)
+        )
+        layout.addWidget(self.click_all_checkbox)
+
+        parallel_layout = QHBoxLayout()
+        parallel_layout.addWidget(QLabel("Max Parallel Matches:"))
+        self.parallel_spinbox = QSpinBox()
+        self.parallel_spinbox.setRange(1, max(1, self.matcher.match_pool.max_workers))
+        self.parallel_spinbox.setValue(self.matcher.max_parallel_matches)
+        self.parallel_spinbox.valueChanged.connect(lambda value: setattr(self.matcher, "max_parallel_matches", value))
+        parallel_layout.addWidget(self.parallel_spinbox)
+
+        parallel_layout.addWidget(QLabel("Click Priority:"))
+        self.priority_spinbox = QSpinBox()
+        self.priority_spinbox.setRange(0, 10)
+        self.priority_spinbox.setValue(self.priority)
+        self.priority_spinbox.valueChanged.connect(lambda value: setattr(self, "priority", value))
+        parallel_layout.addWidget(self.priority_spinbox)
+        layout.addLayout(parallel_layout)
+
+        # Automation controls
+        start_button = QPushButton("Start Automation")
+        start_button.clicked.connect(self.start_automation)
+        layout.addWidget(start_button)
+
+        stop_button = QPushButton("Stop Automation")
+        stop_button.clicked.connect(self.stop_automation)
+        layout.addWidget(stop_button)
+
+        self.setLayout(layout)
+
+    def upload_loot_template(self):
+        """Upload a desired loot image template."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Image File", "", "Image Files (*.png *.jpg *.jpeg)")
+        if file_path:
+            self.matcher.template_store.invalidate(file_path)  # Re-read in case the file was replaced
+            self.matcher.template_store.preload([file_path])
+            self.loot_templates.append(file_path)
+            self.loot_counts[file_path] = 0
+            if file_path in self.loot_targets:
+                del self.loot_targets[file_path]  # Reset target if the same loot image is uploaded again
+            self.update_loot_list()
+
+    def remove_selected_loot(self):
+        """Remove the selected loot image."""
+        selected_items = self.loot_list.selectedItems()
+        for item in selected_items:
+            loot_path = item.data(Qt.UserRole)
+            if loot_path in self.loot_templates:
+                self.loot_templates.remove(loot_path)
+                del self.loot_counts[loot_path]
+                if loot_path in self.loot_notifications:
+                    del self.loot_notifications[loot_path]
+                self.update_loot_list()
+
+    def upload_mp3_file(self):
+        """Upload an MP3 file for loot detection notification."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open MP3 File", "", "Audio Files (*.mp3)")
+        if file_path:
+            selected_items = self.loot_list.selectedItems()
+            if selected_items:
+                loot_path = selected_items[0].data(Qt.UserRole)
+                self.loot_notifications[loot_path] = file_path
+                self.update_loot_list()
+            else:
+                QMessageBox.warning(self, "Error", "Please select a loot image to associate with the MP3 file.")
+
+    def save_notification(self):
+        """Save the loot notifications to a file."""
+        with open("loot_notifications.json", "w") as f:
+            json.dump(self.loot_notifications, f, indent=4)
+        QMessageBox.information(self, "Saved", "Loot notifications saved.")
+
+    def set_loot_target(self):
+        """Set the desired amount of a specific loot image."""
+        selected_items = self.loot_list.selectedItems()
+        if selected_items:
+            loot_path = selected_items[0].data(Qt.UserRole)
+            target, ok = QInputDialog.getInt(self, "Set Loot Target", "Enter desired amount (0 to disable):", min=0)
+            if ok:
+                if target == 0:
+                    if loot_path in self.loot_targets:
+                        del self.loot_targets[loot_path]  # Remove target if set to 0
+                else:
+                    self.loot_targets[loot_path] = target
+                self.update_loot_list()
+        else:
+            QMessageBox.warning(self, "Error", "Please select a loot image to set the target.")
+
+    @pyqtSlot()
+    def update_loot_list(self):
+        """Update the loot list to show images, counts, targets, and MP3 file."""
+        self.loot_list.clear()
+        hide_preview = self.hide_preview_checkbox.isChecked()
+        for loot_path in self.loot_templates:
+            item_text = f"Loot: {os.path.basename(loot_path)} (Detected: {self.loot_counts[loot_path]}x)"
+            if loot_path in self.loot_targets:
+                item_text += f" - Target: {self.loot_targets[loot_path]}"
+            if loot_path in self.loot_notifications:
+                item_text += f" - MP3: {os.path.basename(self.loot_notifications[loot_path])}"
+            item = QListWidgetItem(item_text)
+            if not hide_preview:
+                item.setIcon(QIcon(loot_path))
+            item.setData(Qt.UserRole, loot_path)
+            self.loot_list.addItem(item)
+        if self.mp3_file:
+            item_text = f"MP3: {os.path.basename(self.mp3_file)}"
+            item = QListWidgetItem(item_text)
+            self.loot_list.addItem(item)
+
+    def load_automation_template_from_dropdown(self):
+        """Load a selected automation template."""
+        template_name = self.template_dropdown.currentText()
+        if template_name == "Create New Template":
+            self.templates = []
+            self.matcher.template_settings = {}
+            self.states = {}
+            self.initial_state = None
+        else:
+            self.load_automation_template(self.automation_templates.get(template_name, []))
+        self.update_template_list()
+
+    def update_template_list(self):
+        """Update the displayed template list."""
+        self.template_list.clear()
+        for template in self.templates:
+            item_text = os.path.basename(template)
+            settings = self.matcher.template_settings.get(template, {})
+            scales = settings.get("scales")
+            if scales:
+                item_text += f" - Scales: {', '.join(f'{scale:g}' for scale in scales)}"
+            if settings.get("downscale", 1) > 1:
+                item_text += f" - Matched at 1/{settings['downscale']}"
+            if "roi" in settings:
+                item_text += " - Region: {}, {} {}x{}".format(*settings["roi"])
+            elif "learned_roi" in settings:
+                item_text += " - Learned Region: {}, {} {}x{}".format(*settings["learned_roi"])
+            condition = settings.get("post_click")
+            if condition:
+                if condition["until"] == POST_CLICK_APPEAR:
+                    target = os.path.basename(condition["template"])
+                else:
+                    target = "gone"
+                item_text += f" - After Click: until {target} ({condition.get('timeout', POST_CLICK_TIMEOUT):g}s)"
+            template_states = []
+            for name, state in self.states.items():
+                if template in state["templates"]:
+                    next_state = state["transitions"].get(template)
+                    template_states.append(f"{name} -> {next_state}" if next_state else name)
+            if template_states:
+                item_text += f" - States: {', '.join(template_states)}"
+            stats = self.matcher.template_stats.get(template)
+            if stats.attempts:
+                last_seen = time.strftime("%H:%M:%S", time.localtime(stats.last_seen)) if stats.last_seen else "never"
+                item_text += (f" - Found: {stats.hit_rate:.0%} of {stats.attempts}, last {last_seen}, "
+                              f"{stats.average_latency * 1000:.1f} ms")
+            item = QListWidgetItem(item_text)
+            item.setIcon(QIcon(template))
+            self.template_list.addItem(item)
+
+    def set_search_region(self):
+        """Draw the area of the desktop the selected template is searched in."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select a template to set its search region.")
+            return
+        template_path = self.templates[self.template_list.row(selected_items[0])]
+        self.region_capture_widget = ScreenCaptureWidget(
+            lambda rect: self.apply_search_region(template_path, rect)
+        )
+        self.region_capture_widget.show()
+
+    def apply_search_region(self, template_path, rect):
+        """Store a search region drawn with the screen capture widget."""
+        if rect.width() > 0 and rect.height() > 0:
+            settings = self.matcher.template_settings.setdefault(template_path, {})
+            settings["roi"] = [rect.x(), rect.y(), rect.width(), rect.height()]
+            settings.pop("learned_roi", None)
+            self.update_template_list()
+
+    def clear_search_region(self):
+        """Search the whole desktop for the selected template again."""
+        for item in self.template_list.selectedItems():
+            settings = self.matcher.template_settings.get(self.templates[self.template_list.row(item)], {})
+            settings.pop("roi", None)
+            settings.pop("learned_roi", None)
+        self.update_template_list()
+
+    def set_template_scales(self):
+        """Set the scales the selected template is matched at."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select a template to set its scales.")
+            return
+        template_path = self.templates[self.template_list.row(selected_items[0])]
+        current = self.matcher.template_settings.get(template_path, {}).get("scales", DEFAULT_SCALES)
+        text, ok = QInputDialog.getText(
+            self, "Set Template Scales", "Comma separated scales (empty for default):",
+            text=", ".join(f"{scale:g}" for scale in current)
+        )
+        if not ok:
+            return
+        try:
+            scales = [float(value) for value in text.replace(" ", "").split(",") if value]
+        except ValueError:
+            QMessageBox.warning(self, "Error", "Scales must be numbers, e.g. 0.9, 1.0, 1.1.")
+            return
+        if any(scale <= 0 for scale in scales):
+            QMessageBox.warning(self, "Error", "Scales must be greater than 0.")
+            return
+        settings = self.matcher.template_settings.setdefault(template_path, {})
+        if scales:
+            settings["scales"] = list(normalize_scales(scales))
+            self.matcher.template_store.preload([template_path], {template_path: settings["scales"]})
+        else:
+            settings.pop("scales", None)
+        self.update_template_list()
+
+    def set_template_downscale(self):
+        """Match the selected template at a reduced resolution, e.g. for large high-contrast buttons."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select a template to set its match downscale.")
+            return
+        template_path = self.templates[self.template_list.row(selected_items[0])]
+        settings = self.matcher.template_settings.setdefault(template_path, {})
+        downscale, ok = QInputDialog.getInt(
+            self, "Set Match Downscale", "Match at 1/N resolution (0 to use the global setting):",
+            settings.get("downscale", 0), 0, 8
+        )
+        if not ok:
+            return
+        if downscale:
+            settings["downscale"] = downscale
+        else:
+            settings.pop("downscale", None)
+        self.update_template_list()
+
+    def set_post_click_condition(self):
+        """Choose what to wait for after the selected template is clicked."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select a template to set its post-click condition.")
+            return
+        template_path = self.templates[self.template_list.row(selected_items[0])]
+        choices = ["Nothing (default)", "Until it disappears", "Until a follow-up template appears"]
+        choice, ok = QInputDialog.getItem(
+            self, "Set Post-Click Condition", "After clicking, wait:", choices, 0, False
+        )
+        if not ok:
+            return
+        settings = self.matcher.template_settings.setdefault(template_path, {})
+        if choice == choices[0]:
+            settings.pop("post_click", None)
+            self.update_template_list()
+            return
+        condition = {"until": POST_CLICK_DISAPPEAR}
+        if choice == choices[2]:
+            follow_ups = [path for path in self.templates if path != template_path]
+            if not follow_ups:
+                QMessageBox.warning(self, "Error", "Upload the follow-up template first.")
+                return
+            names = [os.path.basename(path) for path in follow_ups]
+            name, ok = QInputDialog.getItem(self, "Set Post-Click Condition", "Follow-up template:", names, 0, False)
+            if not ok:
+                return
+            condition = {"until": POST_CLICK_APPEAR, "template": follow_ups[names.index(name)]}
+        timeout, ok = QInputDialog.getDouble(
+            self, "Set Post-Click Condition", "Give up after (seconds):", POST_CLICK_TIMEOUT, 0.1, 60.0, 1
+        )
+        if not ok:
+            return
+        condition["timeout"] = timeout
+        settings["post_click"] = condition
+        self.update_template_list()
+
+    def add_to_state(self):
+        """Look for the selected templates while the state machine is in a given state."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select the templates to add to a state.")
+            return
+        name, ok = QInputDialog.getItem(
+            self, "Add to State", "State name (new or existing):", list(self.states), 0, True
+        )
+        name = name.strip()
+        if not ok or not name:
+            return
+        state = self.states.setdefault(name, {"templates": [], "transitions": {}})
+        selected = {self.templates[self.template_list.row(item)] for item in selected_items}
+        # Keep the state's templates in the order they are tried, which is the template list order
+        state["templates"] = [path for path in self.templates if path in selected or path in state["templates"]]
+        if self.initial_state not in self.states:
+            self.initial_state = name
+        self.update_template_list()
+
+    def set_state_transition(self):
+        """Choose the state the machine moves to after the selected template is clicked."""
+        selected_items = self.template_list.selectedItems()
+        if not selected_items:
+            QMessageBox.warning(self, "Error", "Please select a template to set its transition.")
+            return
+        template_path = self.templates[self.template_list.row(selected_items[0])]
+        state_names = [name for name, state in self.states.items() if template_path in state["templates"]]
+        if not state_names:
+            QMessageBox.warning(self, "Error", "Add the template to a state first.")
+            return
+        from_state = state_names[0]
+        if len(state_names) > 1:
+            from_state, ok = QInputDialog.getItem(
+                self, "Set Transition", "Transition when clicked in state:", state_names, 0, False
+            )
+            if not ok:
+                return
+        stay = "(Stay in the same state)"
+        next_state, ok = QInputDialog.getItem(
+            self, "Set Transition", "Next state after the click:", [stay] + list(self.states), 0, True
+        )
+        next_state = next_state.strip()
+        if not ok or not next_state:
+            return
+        transitions = self.states[from_state]["transitions"]
+        if next_state == stay or next_state == from_state:
+            transitions.pop(template_path, None)
+        else:
+            self.states.setdefault(next_state, {"templates": [], "transitions": {}})
+            transitions[template_path] = next_state
+        self.update_template_list()
+
+    def set_initial_state(self):
+        """Choose the state the machine starts in."""
+        if not self.states:
+            QMessageBox.warning(self, "Error", "Add templates to a state first.")
+            return
+        names = list(self.states)
+        current = names.index(self.initial_state) if self.initial_state in names else 0
+        name, ok = QInputDialog.getItem(self, "Set Initial State", "Start in state:", names, current, False)
+        if ok:
+            self.initial_state = name
+
+    def clear_states(self):
+        """Drop the state machine and go back to trying every template in order."""
+        self.states = {}
+        self.initial_state = None
+        self.current_state = None
+        self.pass_position = 0
+        self.update_state_label()
+        self.update_template_list()
+
+    def upload_template(self):
+        """Upload a new image template."""
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Image File", "", "Image Files (*.png *.jpg *.jpeg)")
+        if file_path:
+            self.matcher.template_store.invalidate(file_path)  # Re-read in case the file was replaced
+            self.matcher.template_store.preload([file_path])
+            self.templates.append(file_path)
+            self.update_template_list()
+
+    def remove_selected_template(self):
+        """Remove the selected template."""
+        selected_items = self.template_list.selectedItems()
+        for item in selected_items:
+            index = self.template_list.row(item)
+            template_path = self.templates.pop(index)
+            if template_path not in self.templates:
+                self.matcher.template_settings.pop(template_path, None)
+                for state in self.states.values():
+                    if template_path in state["templates"]:
+                        state["templates"].remove(template_path)
+                    state["transitions"].pop(template_path, None)
+            self.template_list.takeItem(index)
+
+    def save_automation_template(self):
+        """Save the current automation template."""
+        template_name = self.template_name_input.text().strip()
+        if not template_name:
+            QMessageBox.warning(self, "Error", "Please enter a name for the template.")
+            return
+        if not self.templates:
+            QMessageBox.warning(self, "Error", "No templates to save.")
+            return
+        self.automation_templates[template_name] = {
+            "templates": list(self.templates),
+            "settings": {
+                path: settings for path, settings in self.matcher.template_settings.items()
+                if settings and path in self.templates
+            },
+            "states": self.states,
+            "initial_state": self.initial_state if self.states else None,
+        }
+        with open("automation_templates.json", "w") as f:
+            json.dump(self.automation_templates, f, indent=4)
+        if template_name not in [self.template_dropdown.itemText(i) for i in range(self.template_dropdown.count())]:
+            self.template_dropdown.addItem(template_name)
+        QMessageBox.information(self, "Saved", f"Template '{template_name}' saved.")
+
+    def delete_automation_template(self):
+        """Delete the selected automation template."""
+        template_name = self.template_dropdown.currentText()
+        if template_name == "Create New Template":
+            QMessageBox.warning(self, "Error", "Cannot delete the default option.")
+            return
+        if template_name in self.automation_templates:
+            del self.automation_templates[template_name]
+            with open("automation_templates.json", "w") as f:
+                json.dump(self.automation_templates, f, indent=4)
+            self.template_dropdown.removeItem(self.template_dropdown.currentIndex())
+            QMessageBox.information(self, "Deleted", f"Template '{template_name}' deleted.")
+
+    def load_saved_loot_detection_templates(self):
+        """Load saved loot detection templates from a file."""
+        if os.path.exists("loot_detection_templates.json"):
+            with open("loot_detection_templates.json", "r") as f:
+                self.loot_detection_templates = json.load(f)
+
+    def load_loot_detection_template_from_dropdown(self):
+        """Load a selected loot detection template."""
+        template_name = self.loot_template_dropdown.currentText()
+        if template_name == "Create New Template":
+            self.loot_templates = []
+            self.loot_notifications = {}
+        else:
+            template = self.loot_detection_templates.get(template_name, {})
+            self.loot_templates = list(template.keys())
+            self.matcher.template_store.preload(self.loot_templates)
+            self.loot_notifications = template
+            self.loot_targets = {}  # Reset targets when loading a saved template
+        self.update_loot_list()
+
+    def save_loot_detection_template(self):
+        """Save the current loot detection template."""
+        template_name = self.loot_template_name_input.text().strip()
+        if not template_name:
+            QMessageBox.warning(self, "Error", "Please enter a name for the loot detection template.")
+            return
+        if not self.loot_templates:
+            QMessageBox.warning(self, "Error", "No loot templates to save.")
+            return
+        self.loot_detection_templates[template_name] = self.loot_notifications
+        with open("loot_detection_templates.json", "w") as f:
+            json.dump(self.loot_detection_templates, f, indent=4)
+        if template_name not in [self.loot_template_dropdown.itemText(i) for i in range(self.loot_template_dropdown.count())]:
+            self.loot_template_dropdown.addItem(template_name)
+        QMessageBox.information(self, "Saved", f"Loot detection template '{template_name}' saved.")
+
+    def delete_loot_detection_template(self):
+        """Delete the selected loot detection template."""
+        template_name = self.loot_template_dropdown.currentText()
+        if template_name == "Create New Template":
+            QMessageBox.warning(self, "Error", "Cannot delete the default option.")
+            return
+        if template_name in self.loot_detection_templates:
+            del self.loot_detection_templates[template_name]
+            with open("loot_detection_templates.json", "w") as f:
+                json.dump(self.loot_detection_templates, f, indent=4)
+            self.loot_template_dropdown.removeItem(self.loot_template_dropdown.currentIndex())
+            QMessageBox.information(self, "Deleted", f"Loot detection template '{template_name}' deleted.")
+
+    @pyqtSlot(str)
+    def play_notification_sound(self, loot_path):
+        """Play the MP3 notification sound for a specific loot."""
+        if loot_path in self.loot_notifications:
+            try:
+                self.notification_player.play(self.loot_notifications[loot_path])
+            except Exception as e:
+                print(f"Error playing notification sound: {e}")
+
+    @pyqtSlot()
+    def update_loot_status(self):
+        """Update the loot detection status label."""
+        self.loot_status_label.setText("Loot Detected: Yes" if self.loot_detected else "Loot Detected: No")
+
+    def start_automation(self):
+        """Start the automation."""
+        if not self.templates:
+            QMessageBox.warning(self, "Error", "No templates to run!")
+            return
+        self.start()
+        self.update_state_label()
+        self.status_label.setText("Status: Running")
+        Thread(target=self.update_time_elapsed, daemon=True).start()
+
+    @pyqtSlot()
+    def stop_automation(self):
+        """Stop the automation and update the status label."""
+        self.stop()
+        self.status_label.setText("Status: Stopped")
+        self.update_template_list()  # Show the statistics gathered during the run
+
+    def on_frame(self, frame, seconds, matched):
+        """Refresh the frame counters on the GUI thread."""
+        QMetaObject.invokeMethod(self, "update_frame_stats", Qt.QueuedConnection)
+
+    def on_state_changed(self):
+        """Show the new state on the GUI thread."""
+        QMetaObject.invokeMethod(self, "update_state_label", Qt.QueuedConnection)
+
+    def on_loot(self, loot_path):
+        """Update the loot display and play the loot's notification sound."""
+        QMetaObject.invokeMethod(self, "update_loot_status", Qt.QueuedConnection)
+        QMetaObject.invokeMethod(self, "update_loot_list", Qt.QueuedConnection)
+        QMetaObject.invokeMethod(self, "play_notification_sound", Qt.QueuedConnection, Q_ARG(str, loot_path))
+
+    def on_target_reached(self, loot_path):
+        """Tell the user the target was reached and show the group as stopped."""
+        QMetaObject.invokeMethod(self, "show_target_reached_message", Qt.QueuedConnection, Q_ARG(str, loot_path))
+        QMetaObject.invokeMethod(self, "stop_automation", Qt.QueuedConnection)  # Ensure status is updated
+
+    def on_error(self, error):
+        """Show the error and the group as stopped."""
+        QMetaObject.invokeMethod(self, "show_error_message", Qt.QueuedConnection, Q_ARG(str, str(error)))
+        QMetaObject.invokeMethod(self, "stop_automation", Qt.QueuedConnection)
+
+    @pyqtSlot()
+    def update_state_label(self):
+        """Show the state the state machine is in."""
+        self.state_label.setText(f"State: {self.current_state or '-'}")
+
+    @pyqtSlot()
+    def update_frame_stats(self):
+        """Show how many frames were matched or skipped as unchanged, and the achieved frame rate."""
+        self.frame_stats_label.setText(
+            f"Frames: {self.frames_processed} matched, {self.frames_skipped} unchanged | "
+            f"{self.scheduler.achieved_fps():.1f} of {self.scheduler.target_fps:.1f} fps"
+        )
+        if self.timing_panel.isVisible():
+            self.timing_label.setText(self.profiler.report())
+
+    def toggle_timing_panel(self, shown):
+        """Show or hide the per-stage timings."""
+        self.timing_panel.setVisible(shown)
+        self.timing_button.setText("Hide Timings" if shown else "Show Timings")
+        if shown:
+            self.timing_label.setText(self.profiler.report())
+
+    def export_timings(self):
+        """Save the per-stage timings and histograms as CSV."""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "Export Timings", f"{self.group_name}_timings.csv", "CSV Files (*.csv);;All Files (*)"
+        )
+        if file_path:
+            try:
+                self.profiler.export_csv(file_path)
+                QMessageBox.information(self, "Timings Exported", f"Timings saved to {file_path}.")
+            except OSError as e:
+                QMessageBox.critical(self, "Error", f"Could not save timings: {e}")
+
+    def reset_timings(self):
+        """Forget the recorded timings."""
+        self.profiler.reset()
+        self.timing_label.setText(self.profiler.report())
+
+    @pyqtSlot(str)
+    def show_target_reached_message(self, loot_path):
+        """Show a message when the target for a specific loot is reached."""
+        QMessageBox.information(self, "Target Reached", f"Target for {os.path.basename(loot_path)} reached.")
+
+    @pyqtSlot(str)
+    def show_error_message(self, message):
+        """Show an error message."""
+        QMessageBox.critical(self, "Error", message)
+
+    def update_time_elapsed(self):
+        """Update the time elapsed in real-time."""
+        while self.running:
+            if self.timer_started and self.start_time:
+                elapsed_time = int(time.time() - self.start_time)
+                hours, remainder = divmod(elapsed_time, 3600)
+                minutes, seconds, = divmod(remainder, 60)
+                self.time_label.setText(f"Time Elapsed: {hours:02}:{minutes:02}:{seconds:02}")
+            time.sleep(1)
@@ -0,0 +1,64 @@
+"""Time every available capture backend against each other.
+
+    python benchmark_capture.py --frames 50
+    python benchmark_capture.py --backends replay --replay-dir recordings/
+
+Backends whose library is missing (or that need a display when there is none)
+are reported as skipped.
+"""
+import argparse
+import statistics
+import sys
+import time
+
+from capture_backends import CAPTURE_BACKENDS, QtCaptureBackend, create_capture_backend
+
+
+def time_backend(backend, frames, rois):
+    """Return per-capture timings in seconds and the pixel count of the last frame."""
+    timings = []
+    pixels = 0
+    for _ in range(frames):
+        start = time.perf_counter()
+        frame = backend.capture(rois)
+        timings.append(time.perf_counter() - start)
+        pixels = sum(gray.size for _, _, gray in frame.regions)
+    return timings, pixels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=list(CAPTURE_BACKENDS), default=list(CAPTURE_BACKENDS))
+    parser.add_argument("--frames", type=int, default=30, help="Captures per backend")
+    parser.add_argument("--replay-dir", help="Recorded frames for the replay backend")
+    parser.add_argument("--roi", type=int, nargs=4, metavar=("X", "Y", "W", "H"),
+                        help="Only capture this desktop rectangle")
+    args = parser.parse_args()
+    rois = [args.roi] if args.roi else None
+
+    if QtCaptureBackend.name in args.backends:
+        try:
+            from PyQt5.QtWidgets import QApplication
+            app = QApplication(sys.argv[:1])  # QScreen needs a live application
+        except Exception as e:
+            print(f"{QtCaptureBackend.name:<12}skipped ({e})")
+            args.backends.remove(QtCaptureBackend.name)
+
+    print(f"{'backend':<12}{'median ms':>12}{'p95 ms':>10}{'fps':>8}{'pixels':>12}")
+    for name in args.backends:
+        try:
+            backend = create_capture_backend(name, args.replay_dir)
+            timings, pixels = time_backend(backend, args.frames, rois)
+            backend.close()
+        except Exception as e:
+            print(f"{name:<12}skipped ({e})")
+            continue
+        timings.sort()
+        median = statistics.median(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<12}{median * 1000:>12.2f}{p95 * 1000:>10.2f}{1 / median:>8.1f}{pixels:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
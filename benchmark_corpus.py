@@ -0,0 +1,128 @@
+"""Screenshot corpora and the command line shared by the matching benchmarks.
+
+A corpus is a directory holding screenshots (PNG or NPY) and a ``labels.json``:
+
+    {
+        "templates": {"collect": "templates/collect.png"},
+        "frames": {"desktop_001.png": {"collect": [[812, 455]]}}
+    }
+
+Template paths are relative to the corpus directory and every label is the
+centre of a template instance in desktop pixels. Frames without a label for a
+template are expected to contain no match for it. Every benchmark takes either
+a corpus directory or ``--synthetic FRAMES`` to generate one for the run.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+import cv2
+import numpy as np
+
+from capture_backends import load_gray_image
+from template_matching import Frame, Matcher, topmost_hit
+
+
+def load_corpus(corpus_dir):
+    """Return ``(templates, frames)`` where templates maps name to path and frames maps path to labels."""
+    with open(os.path.join(corpus_dir, "labels.json"), "r") as f:
+        labels = json.load(f)
+    templates = {name: os.path.join(corpus_dir, path) for name, path in labels["templates"].items()}
+    frames = {os.path.join(corpus_dir, path): frame_labels for path, frame_labels in labels["frames"].items()}
+    return templates, frames
+
+
+def load_frames(frame_paths):
+    """Return a single-region Frame for every screenshot path."""
+    return {path: Frame([(0, 0, load_gray_image(path))]) for path in frame_paths}
+
+
+def make_synthetic_corpus(corpus_dir, frame_count=5, size=(1080, 1920), template_count=4, seed=0, scale_jitter=0.0):
+    """Write a corpus of textured desktops with templates pasted at known positions.
+
+    With ``scale_jitter`` every pasted instance is resized by a random factor
+    within ``1 ± scale_jitter``, like buttons drawn at a different UI scale.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(corpus_dir, "templates"), exist_ok=True)
+    templates = {}
+    for index in range(template_count):
+        height, width = rng.integers(32, 96, size=2)
+        template = cv2.GaussianBlur(rng.integers(0, 256, (height, width), dtype=np.uint8), (5, 5), 0)
+        cv2.rectangle(template, (2, 2), (int(width) - 3, int(height) - 3), 255, 2)
+        name = f"template_{index}"
+        cv2.imwrite(os.path.join(corpus_dir, "templates", f"{name}.png"), template)
+        templates[name] = template
+
+    frames = {}
+    for frame_index in range(frame_count):
+        noise = rng.integers(0, 256, (size[0] // 8, size[1] // 8), dtype=np.uint8)
+        desktop = cv2.resize(noise, (size[1], size[0]), interpolation=cv2.INTER_CUBIC)
+        frame_labels = {}
+        for name, template in templates.items():
+            if rng.random() < 0.25:
+                continue  # Leave some templates off screen
+            if scale_jitter:
+                scale = rng.uniform(1 - scale_jitter, 1 + scale_jitter)
+                template = cv2.resize(template, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            height, width = template.shape
+            x = int(rng.integers(0, size[1] - width))
+            y = int(rng.integers(0, size[0] - height))
+            desktop[y:y + height, x:x + width] = template
+            frame_labels[name] = [[x + width // 2, y + height // 2]]
+        frame_name = f"desktop_{frame_index:03}.png"
+        cv2.imwrite(os.path.join(corpus_dir, frame_name), desktop)
+        frames[frame_name] = frame_labels
+
+    with open(os.path.join(corpus_dir, "labels.json"), "w") as f:
+        json.dump({
+            "templates": {name: f"templates/{name}.png" for name in templates},
+            "frames": frames,
+        }, f, indent=4)
+
+
+def is_correct(hits, expected, tolerance):
+    """A result is correct when it finds the topmost labelled instance, or nothing when there is none."""
+    location = topmost_hit(hits)
+    if not expected:
+        return location is None
+    if location is None:
+        return False
+    target = min(expected, key=lambda point: point[1])
+    return abs(location["x"] - target[0]) <= tolerance and abs(location["y"] - target[1]) <= tolerance
+
+
+def benchmark_matcher(threshold, template_store, match_pool, **options):
+    """Return a Matcher for timed runs.
+
+    Incremental matching is off so every run really matches the frame instead
+    of reusing the hits of the previous, identical one.
+    """
+    return Matcher(threshold, template_store=template_store, match_pool=match_pool, incremental=False, **options)
+
+
+def corpus_parser(description, tolerance_help="Allowed distance from a label in pixels"):
+    """Return an argument parser with the corpus, --synthetic, --scale-jitter, --repeat and --tolerance options."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("corpus", nargs="?", help="Directory with labels.json and screenshots")
+    parser.add_argument("--synthetic", type=int, metavar="FRAMES",
+                        help="Generate a synthetic corpus with this many frames instead")
+    parser.add_argument("--scale-jitter", type=float, default=0.0,
+                        help="Resize synthetic template instances by up to this fraction")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per template and frame")
+    parser.add_argument("--tolerance", type=int, default=4, help=tolerance_help)
+    return parser
+
+
+def run_on_corpus(parser, args, run_benchmark):
+    """Call ``run_benchmark(corpus_dir)`` on the given corpus, or on a synthetic one made for this run."""
+    if args.synthetic:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            make_synthetic_corpus(corpus_dir, args.synthetic, scale_jitter=args.scale_jitter)
+            run_benchmark(corpus_dir)
+    elif args.corpus:
+        run_benchmark(args.corpus)
+    else:
+        parser.error("a corpus directory or --synthetic is required")
+    return 0
@@ -0,0 +1,70 @@
+"""Report matching accuracy and latency per downscale factor on a screenshot corpus.
+
+Uses the corpus layout described in benchmark_corpus.py (a directory of
+screenshots with a ``labels.json``). Every factor matches the desktop and the
+templates shrunk to 1/N with area averaging, and maps hits back to full
+resolution before they are checked against the labels.
+
+    python benchmark_downscale.py path/to/corpus --factors 1 2 3 4
+    python benchmark_downscale.py --synthetic 10
+"""
+import statistics
+import sys
+import time
+
+from benchmark_corpus import benchmark_matcher, corpus_parser, is_correct, load_corpus, load_frames, run_on_corpus
+from template_matching import Frame, MatchPool, TemplateStore
+
+
+def run_benchmark(corpus_dir, factors, threshold, repeat, tolerance):
+    """Print the latency and accuracy of every template at every downscale factor."""
+    templates, frames = load_corpus(corpus_dir)
+    store = TemplateStore()
+    match_pool = MatchPool()
+    matchers = {factor: benchmark_matcher(threshold, store, match_pool, downscale=factor) for factor in factors}
+    gray_frames = load_frames(frames)
+
+    print(f"{len(gray_frames)} frames, {len(templates)} templates, threshold {threshold}")
+    header = f"{'template':<24}" + "".join(f"{f'1/{factor} ms':>10}{'ok':>8}" for factor in factors)
+    print(header)
+    totals = {factor: [0.0, 0] for factor in factors}  # {factor: [ms per frame, correct]}
+    for name, template_path in templates.items():
+        row = f"{name:<24}"
+        for factor in factors:
+            matcher = matchers[factor]
+            matcher.load_templates([template_path])
+            timings = []
+            correct = 0
+            for frame_path, frame_labels in frames.items():
+                frame = gray_frames[frame_path]
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    # A fresh Frame every run, so shrinking the desktop is part of the cost
+                    hits = matcher.match_template(Frame(frame.regions), template_path)
+                    timings.append(time.perf_counter() - start)
+                correct += is_correct(hits, frame_labels.get(name, []), tolerance * factor)
+            median_ms = statistics.median(timings) * 1000
+            totals[factor][0] += median_ms
+            totals[factor][1] += correct
+            row += f"{median_ms:>10.2f}{correct:>4}/{len(frames):<3}"
+        print(row)
+    checked = len(frames) * len(templates)
+    print(f"{'total per frame':<24}" + "".join(
+        f"{totals[factor][0]:>10.2f}{totals[factor][1] / checked:>8.0%}" for factor in factors
+    ))
+    match_pool.shutdown()
+
+
+def main():
+    parser = corpus_parser(__doc__.splitlines()[0], tolerance_help="Allowed distance from a label in downscaled pixels")
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 3, 4], help="Downscale factors to compare")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    return run_on_corpus(
+        parser, args,
+        lambda corpus_dir: run_benchmark(corpus_dir, args.factors, args.threshold, args.repeat, args.tolerance)
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Measure find_button latency, throughput and accuracy on a screenshot corpus.
+
+Uses the corpus layout described in benchmark_corpus.py (a directory of
+screenshots with a ``labels.json``) and compares the 3-scale set the app uses
+with the 10-scale set of bitautomation.py. For each scale set it reports:
+
+* per-template latency percentiles of a single template match,
+* frames per second when every template is matched against a frame at once,
+* precision and recall of the distinct instances found at every threshold.
+
+Each template is matched once per frame at the lowest threshold; the higher
+thresholds are evaluated by dropping hits that score below them.
+
+    python benchmark_find_button.py path/to/corpus --thresholds 0.7 0.8 0.9
+    python benchmark_find_button.py --synthetic 10 --scale-jitter 0.15
+"""
+import sys
+import time
+
+import numpy as np
+
+from benchmark_corpus import benchmark_matcher, corpus_parser, load_corpus, load_frames, run_on_corpus
+from template_matching import DEFAULT_SCALES, MatchPool, TemplateStore, distinct_instances
+
+SCALE_SETS = {
+    "3 scales": DEFAULT_SCALES,  # 9thfeb2025
+    "10 scales": tuple(float(scale) for scale in np.linspace(0.8, 1.2, 10)),  # bitautomation.py
+}
+DEFAULT_THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95)
+PERCENTILES = (50, 90, 99)
+
+
+def score_instances(hits, expected, tolerance):
+    """Return ``(true_positives, false_positives, false_negatives)`` of the distinct instances in ``hits``.
+
+    An instance is a true positive when its centre is within ``tolerance`` pixels
+    of a labelled instance that no other hit has claimed yet.
+    """
+    instances = distinct_instances(hits)
+    unmatched = [list(point) for point in expected]
+    true_positives = 0
+    for hit in instances:
+        for point in unmatched:
+            if abs(hit["x"] - point[0]) <= tolerance and abs(hit["y"] - point[1]) <= tolerance:
+                unmatched.remove(point)
+                true_positives += 1
+                break
+    return true_positives, len(instances) - true_positives, len(unmatched)
+
+
+def benchmark_scale_set(matcher, templates, frames, gray_frames, thresholds, repeat, tolerance):
+    """Return ``(latencies, frame_seconds, counts)`` for one configured matcher.
+
+    ``latencies`` maps template name to single-match durations, ``frame_seconds``
+    holds the durations of matching every template against one frame, and
+    ``counts`` maps threshold to ``[true_positives, false_positives, false_negatives]``.
+    """
+    latencies = {name: [] for name in templates}
+    frame_seconds = []
+    counts = {threshold: [0, 0, 0] for threshold in thresholds}
+    template_paths = list(templates.values())
+    for frame_path, frame_labels in frames.items():
+        frame = gray_frames[frame_path]
+        for name, template_path in templates.items():
+            for _ in range(repeat):
+                start = time.perf_counter()
+                hits = matcher.match_template(frame, template_path)
+                latencies[name].append(time.perf_counter() - start)
+            for threshold in thresholds:
+                scores = score_instances(hits[hits["score"] >= threshold], frame_labels.get(name, []), tolerance)
+                counts[threshold] = [total + score for total, score in zip(counts[threshold], scores)]
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matcher.match(frame, template_paths)
+            frame_seconds.append(time.perf_counter() - start)
+    return latencies, frame_seconds, counts
+
+
+def precision_recall(true_positives, false_positives, false_negatives):
+    """Return ``(precision, recall)``, counting an empty denominator as perfect."""
+    found = true_positives + false_positives
+    labelled = true_positives + false_negatives
+    return (true_positives / found if found else 1.0), (true_positives / labelled if labelled else 1.0)
+
+
+def run_benchmark(corpus_dir, thresholds, repeat, tolerance):
+    """Print latency percentiles, throughput and precision/recall for every scale set."""
+    templates, frames = load_corpus(corpus_dir)
+    thresholds = sorted(thresholds)
+    store = TemplateStore()
+    match_pool = MatchPool()
+    gray_frames = load_frames(frames)
+    print(f"{len(gray_frames)} frames, {len(templates)} templates, {repeat} runs each, "
+          f"thresholds {', '.join(f'{threshold:g}' for threshold in thresholds)}")
+
+    summary = []
+    for set_name, scales in SCALE_SETS.items():
+        matcher = benchmark_matcher(thresholds[0], store, match_pool)
+        matcher.load_templates(templates.values(), {path: {"scales": list(scales)} for path in templates.values()})
+        latencies, frame_seconds, counts = benchmark_scale_set(
+            matcher, templates, frames, gray_frames, thresholds, repeat, tolerance
+        )
+
+        print(f"\n{set_name} ({min(scales):.2f}-{max(scales):.2f})")
+        print(f"{'template':<24}" + "".join(f"{f'p{percentile} ms':>10}" for percentile in PERCENTILES))
+        for name, timings in latencies.items():
+            values = np.percentile(timings, PERCENTILES) * 1000
+            print(f"{name:<24}" + "".join(f"{value:>10.2f}" for value in values))
+        fps = len(frame_seconds) / sum(frame_seconds)
+        print(f"all templates per frame: {np.median(frame_seconds) * 1000:.2f} ms median, {fps:.1f} frames/sec")
+        print(f"{'threshold':<12}{'precision':>10}{'recall':>10}{'tp':>8}{'fp':>8}{'fn':>8}")
+        for threshold in thresholds:
+            precision, recall = precision_recall(*counts[threshold])
+            cells = "".join(f"{count:>8}" for count in counts[threshold])
+            print(f"{threshold:<12g}{precision:>10.1%}{recall:>10.1%}{cells}")
+        summary.append((set_name, fps, counts))
+
+    header = "".join(f"{f'P/R @{threshold:g}':>16}" for threshold in thresholds)
+    print(f"\n{'scale set':<12}{'frames/sec':>12}{header}")
+    for set_name, fps, counts in summary:
+        cells = "".join(
+            f"{'{:.0%}/{:.0%}'.format(*precision_recall(*counts[threshold])):>16}" for threshold in thresholds
+        )
+        print(f"{set_name:<12}{fps:>12.1f}{cells}")
+    match_pool.shutdown()
+
+
+def main():
+    parser = corpus_parser(__doc__.splitlines()[0])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=list(DEFAULT_THRESHOLDS))
+    args = parser.parse_args()
+    return run_on_corpus(
+        parser, args, lambda corpus_dir: run_benchmark(corpus_dir, args.thresholds, args.repeat, args.tolerance)
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Compare exhaustive and coarse-to-fine template matching on a screenshot corpus.
+
+The corpus layout is described in benchmark_corpus.py.
+
+    python benchmark_matching.py path/to/corpus
+    python benchmark_matching.py --synthetic 10
+"""
+import statistics
+import sys
+import time
+
+from benchmark_corpus import benchmark_matcher, corpus_parser, is_correct, load_corpus, load_frames, run_on_corpus
+from template_matching import COARSE_FACTOR, MATCH_MODE_COARSE_TO_FINE, MATCH_MODE_EXHAUSTIVE, MatchPool, TemplateStore
+
+
+def run_benchmark(corpus_dir, threshold, factor, repeat, tolerance):
+    """Print per-template latency and accuracy for both matching modes."""
+    templates, frames = load_corpus(corpus_dir)
+    store = TemplateStore()
+    match_pool = MatchPool()
+    matchers = {
+        mode: benchmark_matcher(threshold, store, match_pool, match_mode=match_mode)
+        for mode, match_mode in (("exhaustive", MATCH_MODE_EXHAUSTIVE), ("coarse", MATCH_MODE_COARSE_TO_FINE))
+    }
+    matchers["coarse"].coarse_factor = factor
+    gray_frames = load_frames(frames)
+    for frame in gray_frames.values():
+        frame.coarse_regions(factor)  # Downsample up front so it is not part of the timings
+
+    print(f"{len(gray_frames)} frames, {len(templates)} templates, threshold {threshold}, coarse factor 1/{factor}")
+    print(f"{'template':<24}{'exhaustive ms':>15}{'coarse ms':>12}{'speedup':>10}{'exh. ok':>10}{'coarse ok':>11}")
+    totals = {"exhaustive": 0.0, "coarse": 0.0}
+    for name, template_path in templates.items():
+        for matcher in matchers.values():
+            matcher.load_templates([template_path])
+        timings = {"exhaustive": [], "coarse": []}
+        correct = {"exhaustive": 0, "coarse": 0}
+        for frame_path, frame_labels in frames.items():
+            frame = gray_frames[frame_path]
+            expected = frame_labels.get(name, [])
+            for mode, matcher in matchers.items():
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    hits = matcher.match_template(frame, template_path)
+                    timings[mode].append(time.perf_counter() - start)
+                correct[mode] += is_correct(hits, expected, tolerance)
+
+        exhaustive_ms = statistics.median(timings["exhaustive"]) * 1000
+        coarse_ms = statistics.median(timings["coarse"]) * 1000
+        totals["exhaustive"] += exhaustive_ms
+        totals["coarse"] += coarse_ms
+        print(f"{name:<24}{exhaustive_ms:>15.2f}{coarse_ms:>12.2f}{exhaustive_ms / coarse_ms:>9.1f}x"
+              f"{correct['exhaustive']:>6}/{len(frames):<3}{correct['coarse']:>7}/{len(frames):<3}")
+    print(f"{'total per frame':<24}{totals['exhaustive']:>15.2f}{totals['coarse']:>12.2f}"
+          f"{totals['exhaustive'] / totals['coarse']:>9.1f}x")
+    match_pool.shutdown()
+
+
+def main():
+    parser = corpus_parser(__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--factor", type=int, default=COARSE_FACTOR, help="Coarse downsampling factor")
+    args = parser.parse_args()
+    return run_on_corpus(
+        parser, args,
+        lambda corpus_dir: run_benchmark(corpus_dir, args.threshold, args.factor, args.repeat, args.tolerance)
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Measure how long the app takes to show its window and to finish its first match.
+
+Each run starts the app (9thfeb2025) in a fresh Python process and reports,
+counted from just before the process was launched:
+
+* imports: the app module and everything it imports are loaded,
+* window: the main window is shown and the event loop is running,
+* first match: one frame was captured and matched with the first group's matcher.
+
+The first match starts as soon as the window is up, so it includes whatever
+is still being loaded in the background: the matching modules with NumPy and
+OpenCV, and the default group built on them. Without ``--template`` a patch
+cut from the middle of the captured frame is matched.
+
+    python benchmark_startup.py --runs 5
+    python benchmark_startup.py --offscreen --capture-backend replay --replay-dir recordings/
+"""
+import argparse
+import importlib.machinery
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Thread
+
+APP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "9thfeb2025")
+MILESTONES = ("imports", "window", "first match")
+
+
+def load_app_module():
+    """Import the app script, which has no .py extension, without running its __main__ block."""
+    loader = importlib.machinery.SourceFileLoader("automation_app", APP_SCRIPT)
+    spec = importlib.util.spec_from_loader(loader.name, loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    return module
+
+
+def first_match(window, template_path):
+    """Wait for the default group, then capture one frame and match a template in it with its matcher."""
+    window.loaded.wait()
+    if window.load_error is not None:
+        raise window.load_error
+    group = next(iter(window.groups.values()))
+    frame = group.capture_backend.capture()
+    if template_path is None:
+        import cv2
+        _, _, gray = frame.regions[0]
+        height, width = gray.shape
+        template_path = os.path.join(tempfile.mkdtemp(), "patch.png")
+        cv2.imwrite(template_path, gray[height // 2 - 16:height // 2 + 16, width // 2 - 16:width // 2 + 16])
+    return group.matcher.match_template(frame, template_path)
+
+
+def run_child(args):
+    """Start the app, print the milestone times as JSON and quit."""
+    timings = {}
+    app_module = load_app_module()
+    timings["imports"] = time.time() - args.launched
+
+    from PyQt5.QtCore import QMetaObject, Qt, QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+    window = app_module.AutomationApp(args.capture_backend, args.replay_dir)
+    window.show()
+    window.load_in_background()
+
+    def match_and_quit():
+        try:
+            first_match(window, args.template)
+            timings["first match"] = time.time() - args.launched
+        except Exception as e:
+            timings["error"] = str(e)
+        QMetaObject.invokeMethod(app, "quit", Qt.QueuedConnection)
+
+    def window_shown():
+        timings["window"] = time.time() - args.launched
+        Thread(target=match_and_quit, daemon=True).start()
+
+    QTimer.singleShot(0, window_shown)  # Runs once the event loop has started, after the window is shown
+    app.exec_()
+    print(json.dumps(timings))
+    return 0
+
+
+def run_parent(args):
+    """Launch the app ``args.runs`` times and print the milestone times of every run."""
+    command = [sys.executable, os.path.abspath(__file__), "--capture-backend", args.capture_backend]
+    if args.replay_dir:
+        command += ["--replay-dir", args.replay_dir]
+    if args.template:
+        command += ["--template", args.template]
+    env = dict(os.environ)
+    if args.offscreen:
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    print(f"{'run':<6}" + "".join(f"{f'{milestone} ms':>16}" for milestone in MILESTONES))
+    results = {milestone: [] for milestone in MILESTONES}
+    for run in range(1, args.runs + 1):
+        launched = time.time()
+        completed = subprocess.run(
+            command + ["--child", "--launched", repr(launched)], env=env, capture_output=True, text=True
+        )
+        lines = completed.stdout.strip().splitlines()
+        try:
+            timings = json.loads(lines[-1])
+        except (IndexError, ValueError):
+            error = (completed.stderr.strip().splitlines() or [f"exit code {completed.returncode}"])[-1]
+            print(f"{run:<6}failed: {error}")
+            continue
+        if "error" in timings:
+            print(f"{run:<6}first match failed: {timings['error']}")
+        row = f"{run:<6}"
+        for milestone in MILESTONES:
+            if milestone in timings:
+                results[milestone].append(timings[milestone] * 1000)
+                row += f"{timings[milestone] * 1000:>16.0f}"
+            else:
+                row += f"{'-':>16}"
+        print(row)
+    if any(results.values()):
+        print(f"{'median':<6}" + "".join(
+            f"{statistics.median(results[milestone]):>16.0f}" if results[milestone] else f"{'-':>16}"
+            for milestone in MILESTONES
+        ))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Fresh app processes to time")
+    parser.add_argument("--capture-backend", default="qt",
+                        help="Capture backend the app uses: qt, mss, pyautogui or replay (default: qt)")
+    parser.add_argument("--replay-dir", help="Recorded frames for the replay backend")
+    parser.add_argument("--template", help="Template image for the first match")
+    parser.add_argument("--offscreen", action="store_true", help="Run Qt without a display")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--launched", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    return run_child(args) if args.child else run_parent(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
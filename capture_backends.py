@@ -0,0 +1,224 @@
+"""Screen capture backends that turn the desktop into grayscale frames for matching.
+
+Every backend returns a ``template_matching.Frame`` from ``capture(rois)``, where
+``rois`` is a list of ``[x, y, width, height]`` desktop rectangles that must be
+covered, or None for every monitor in full. The frame's ``timings`` tell how
+long grabbing the screen ("capture") and converting it to grayscale ("gray")
+took. ``poll(rois)`` captures for the quick checks made between ticks, such as
+waiting for a post-click condition. GUI and capture libraries are only imported
+when their backend is created, so the replay backend works on a machine without
+a display.
+"""
+import glob
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from template_matching import Frame, union_bounds
+
+
+class CaptureBackend:
+    """Base class for capture backends."""
+
+    name = None
+
+    def capture(self, rois=None):
+        """Return a Frame covering ``rois`` (or all monitors when None)."""
+        raise NotImplementedError
+
+    def poll(self, rois=None):
+        """Return a Frame covering ``rois`` for a check between ticks; live screens are simply captured again."""
+        return self.capture(rois)
+
+    def close(self):
+        """Release anything the backend holds on to."""
+
+
+class QtCaptureBackend(CaptureBackend):
+    """Capture with ``QScreen.grabWindow``; needs a running QApplication."""
+
+    name = "qt"
+
+    def __init__(self):
+        from PyQt5.QtWidgets import QApplication
+        self._application = QApplication
+
+    def capture(self, rois=None):
+        regions = []
+        timings = {"capture": 0.0, "gray": 0.0}
+        for screen in self._application.screens():
+            screen_geometry = screen.geometry()
+            bounds = union_bounds(
+                screen_geometry.width(), screen_geometry.height(), screen_geometry.x(), screen_geometry.y(), rois
+            )
+            if bounds is None:
+                continue  # No template is searched on this monitor
+            left, top, right, bottom = bounds  # Relative to the monitor, like grabWindow's arguments
+            start = time.perf_counter()
+            screen_image = screen.grabWindow(0, left, top, right - left, bottom - top).toImage()
+            screen_image = screen_image.convertToFormat(4)
+            width = screen_image.width()
+            height = screen_image.height()
+            ptr = screen_image.constBits()
+            ptr.setsize(screen_image.byteCount())
+            # Wrap the Qt buffer in place (rows may be padded) instead of copying it into a new array
+            screen_array = np.ndarray(
+                (height, width, 4), dtype=np.uint8, buffer=ptr, strides=(screen_image.bytesPerLine(), 4, 1)
+            )
+            grabbed = time.perf_counter()
+            screen_gray = cv2.cvtColor(screen_array, cv2.COLOR_BGRA2GRAY)
+            timings["capture"] += grabbed - start
+            timings["gray"] += time.perf_counter() - grabbed
+            regions.append((screen_geometry.x() + left, screen_geometry.y() + top, screen_gray))
+        return Frame(regions, timings=timings)
+
+
+class MssCaptureBackend(CaptureBackend):
+    """Capture with ``mss``, which works without Qt."""
+
+    name = "mss"
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        self._local = threading.local()  # mss handles must stay on the thread that opened them
+
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = self._local.sct = self._mss.mss()
+        return sct
+
+    def capture(self, rois=None):
+        sct = self._sct()
+        regions = []
+        timings = {"capture": 0.0, "gray": 0.0}
+        for monitor in sct.monitors[1:]:  # monitors[0] is the whole virtual desktop
+            bounds = union_bounds(monitor["width"], monitor["height"], monitor["left"], monitor["top"], rois)
+            if bounds is None:
+                continue
+            left, top, right, bottom = bounds
+            area = {
+                "left": monitor["left"] + left, "top": monitor["top"] + top,
+                "width": right - left, "height": bottom - top,
+            }
+            start = time.perf_counter()
+            screen_array = np.asarray(sct.grab(area))  # BGRA, shares the screenshot's buffer
+            grabbed = time.perf_counter()
+            screen_gray = cv2.cvtColor(screen_array, cv2.COLOR_BGRA2GRAY)
+            timings["capture"] += grabbed - start
+            timings["gray"] += time.perf_counter() - grabbed
+            regions.append((area["left"], area["top"], screen_gray))
+        return Frame(regions, timings=timings)
+
+    def close(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class PyAutoGuiCaptureBackend(CaptureBackend):
+    """Capture the primary monitor with ``pyautogui.screenshot``."""
+
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def capture(self, rois=None):
+        width, height = self._pyautogui.size()
+        bounds = union_bounds(width, height, 0, 0, rois)
+        if bounds is None:
+            return Frame([])
+        left, top, right, bottom = bounds
+        start = time.perf_counter()
+        screenshot = self._pyautogui.screenshot(region=(left, top, right - left, bottom - top))
+        grabbed = time.perf_counter()
+        screen_gray = cv2.cvtColor(np.asarray(screenshot), cv2.COLOR_RGB2GRAY)
+        timings = {"capture": grabbed - start, "gray": time.perf_counter() - grabbed}
+        return Frame([(left, top, screen_gray)], timings=timings)
+
+
+class ReplayCaptureBackend(CaptureBackend):
+    """Feed recorded PNG or NPY frames from a directory, in file name order.
+
+    Each file is treated as a desktop whose top-left corner is at ``(0, 0)``.
+    After the last file the replay starts over unless ``loop`` is False, in which
+    case every further capture returns an empty frame. Polls look at the latest
+    captured file again instead of moving on, so a run replays the same frames
+    however often it polls.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory, loop=True):
+        self.paths = sorted(
+            path for path in glob.glob(os.path.join(directory, "*"))
+            if path.lower().endswith((".png", ".npy"))
+        )
+        if not self.paths:
+            raise ValueError(f"No PNG or NPY frames found in {directory}.")
+        self.loop = loop
+        self.position = 0
+        self._lock = threading.Lock()
+
+    def capture(self, rois=None):
+        with self._lock:
+            if self.position >= len(self.paths):
+                if not self.loop:
+                    return Frame([])
+                self.position = 0
+            path = self.paths[self.position]
+            self.position += 1
+        return self._load(path, rois)
+
+    def poll(self, rois=None):
+        with self._lock:
+            path = self.paths[max(0, self.position - 1)]
+        return self._load(path, rois)
+
+    def _load(self, path, rois):
+        start = time.perf_counter()
+        screen_gray = load_gray_image(path)  # Decoding includes any grayscale conversion
+        timings = {"capture": time.perf_counter() - start}
+        bounds = union_bounds(screen_gray.shape[1], screen_gray.shape[0], 0, 0, rois)
+        if bounds is None:
+            return Frame([])
+        left, top, right, bottom = bounds
+        return Frame([(left, top, screen_gray[top:bottom, left:right])], timings=timings)
+
+
+def load_gray_image(path):
+    """Read a PNG or NPY screenshot as a grayscale array."""
+    if path.lower().endswith(".npy"):
+        image = np.load(path)
+        if image.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            image = cv2.cvtColor(image, code)
+        return image
+    image = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Frame {path} could not be loaded.")
+    return image
+
+
+CAPTURE_BACKENDS = {
+    backend.name: backend
+    for backend in (QtCaptureBackend, MssCaptureBackend, PyAutoGuiCaptureBackend, ReplayCaptureBackend)
+}
+
+
+def create_capture_backend(name, replay_dir=None):
+    """Create a capture backend by name ("qt", "mss", "pyautogui" or "replay")."""
+    if name not in CAPTURE_BACKENDS:
+        raise ValueError(f"Unknown capture backend '{name}'. Choose from: {', '.join(CAPTURE_BACKENDS)}.")
+    if name == ReplayCaptureBackend.name:
+        if not replay_dir:
+            raise ValueError("The replay capture backend needs a directory of recorded frames.")
+        return ReplayCaptureBackend(replay_dir)
+    return CAPTURE_BACKENDS[name]()
@@ -0,0 +1,99 @@
+"""Rolling per-stage timings of the automation loop.
+
+Every tick a group records how long each stage took: grabbing the screen
+(``capture``), converting it to grayscale (``gray``), downsampling it
+(``resize``), ``cv2.matchTemplate`` over every template (``match``), reducing
+the score maps to candidate hits (``collect``), turning hits into clicks and
+loot (``candidates``) and the scheduler's wait before the tick (``sleep``).
+``match`` and ``collect`` add up the time of every matching task, whether it
+ran on a thread or in a worker process, so with parallel tasks they can exceed
+the time the tick took. ``StageProfiler`` keeps the latest samples of each
+stage for percentiles, histograms and CSV export.
+"""
+import csv
+import threading
+from collections import deque
+
+import numpy as np
+
+STAGES = ("capture", "gray", "resize", "match", "collect", "candidates", "sleep")
+PROFILE_HISTORY = 500  # Samples kept per stage
+HISTOGRAM_EDGES_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)  # Upper bucket edges; the last is open
+SPARK_BLOCKS = " ▁▂▃▄▅▆▇█"
+
+
+class StageProfiler:
+    """The latest durations of every loop stage, in seconds."""
+
+    def __init__(self, history=PROFILE_HISTORY):
+        self.history = history
+        self._samples = {stage: deque(maxlen=history) for stage in STAGES}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """Add one duration of a stage."""
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.history)
+            samples.append(seconds)
+
+    def record_all(self, timings):
+        """Add one duration per stage from a ``{stage: seconds}`` dict."""
+        for stage, seconds in timings.items():
+            self.record(stage, seconds)
+
+    def samples(self, stage):
+        """Return the recorded durations of a stage, oldest first."""
+        with self._lock:
+            return list(self._samples.get(stage, ()))
+
+    def reset(self):
+        """Forget every recorded duration."""
+        with self._lock:
+            for samples in self._samples.values():
+                samples.clear()
+
+    def summary(self):
+        """Return ``{stage: (samples, mean_ms, p50_ms, p95_ms, max_ms)}`` for every stage with samples."""
+        result = {}
+        for stage in list(self._samples):
+            samples = self.samples(stage)
+            if samples:
+                milliseconds = np.array(samples) * 1000
+                p50, p95 = np.percentile(milliseconds, (50, 95))
+                result[stage] = (len(samples), milliseconds.mean(), p50, p95, milliseconds.max())
+        return result
+
+    def histogram(self, stage, edges=HISTOGRAM_EDGES_MS):
+        """Return how many samples of a stage fall into each bucket below ``edges`` (ms), plus one above."""
+        milliseconds = np.array(self.samples(stage)) * 1000
+        buckets = np.searchsorted(edges, milliseconds, side="right")
+        return np.bincount(buckets, minlength=len(edges) + 1).tolist()
+
+    def sparkline(self, stage, edges=HISTOGRAM_EDGES_MS):
+        """Draw the histogram of a stage as one character per bucket."""
+        counts = self.histogram(stage, edges)
+        peak = max(counts) or 1
+        return "".join(SPARK_BLOCKS[-(-count * (len(SPARK_BLOCKS) - 1) // peak)] for count in counts)
+
+    def report(self):
+        """Return a fixed-width table of every stage, with its histogram."""
+        lines = [f"{'stage':<11}{'n':>5}{'mean':>8}{'p50':>8}{'p95':>8}{'max':>8}  histogram (ms)"]
+        for stage, (count, mean, p50, p95, peak) in self.summary().items():
+            lines.append(
+                f"{stage:<11}{count:>5}{mean:>8.2f}{p50:>8.2f}{p95:>8.2f}{peak:>8.2f}  {self.sparkline(stage)}"
+            )
+        lines.append(f"{'':<50}{HISTOGRAM_EDGES_MS[0]:g} .. {HISTOGRAM_EDGES_MS[-1]:g}+")
+        return "\n".join(lines)
+
+    def export_csv(self, path, edges=HISTOGRAM_EDGES_MS):
+        """Write the summary and histogram of every stage to a CSV file."""
+        buckets = [f"<{edge:g}ms" for edge in edges] + [f">={edges[-1]:g}ms"]
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["stage", "samples", "mean_ms", "p50_ms", "p95_ms", "max_ms"] + buckets)
+            for stage, values in self.summary().items():
+                writer.writerow(
+                    [stage, values[0]] + [f"{value:.3f}" for value in values[1:]] + self.histogram(stage, edges)
+                )
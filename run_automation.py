@@ -0,0 +1,160 @@
+"""Run a saved automation template without the window.
+
+Loads a template from ``automation_templates.json`` (and optionally a loot
+template from ``loot_detection_templates.json``), runs the same match/click/loot
+loop as the app and prints how long every tick took.
+
+    python run_automation.py "Daily Rewards" --loot "Rare Drops" --target drops/gem.png=3
+    python run_automation.py "Daily Rewards" --capture-backend replay --replay-dir recordings/ --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from automation_group import AutomationGroup
+from automation_scheduler import TARGET_FPS, AutomationScheduler
+from capture_backends import CAPTURE_BACKENDS, MssCaptureBackend, QtCaptureBackend, create_capture_backend
+from template_matching import MATCH_MODE_COARSE_TO_FINE, MatchPool, TemplateStatistics
+
+STATUS_INTERVAL = 0.2  # Seconds between checks of whether the run is over
+
+
+class HeadlessAutomationGroup(AutomationGroup):
+    """An automation group that reports to the console instead of widgets."""
+
+    def on_frame(self, frame, seconds, matched):
+        pixels = sum(gray.size for _, _, gray in frame.regions)
+        print(
+            f"frame {frame.seq:>6}  capture {self.scheduler.capture_seconds * 1000:7.2f} ms  "
+            f"{'match' if matched else 'reuse'} {seconds * 1000:7.2f} ms  "
+            f"{pixels:>9} px  {self.scheduler.achieved_fps():5.1f} fps"
+        )
+
+    def on_state_changed(self):
+        print(f"State: {self.current_state}")
+
+    def on_loot(self, loot_path):
+        print(f"Loot detected: {loot_path} ({self.loot_counts[loot_path]})")
+
+    def on_target_reached(self, loot_path):
+        print(f"Target reached for {loot_path}: {self.loot_counts[loot_path]}")
+
+    def on_error(self, error):
+        print(f"An error occurred: {error}")
+
+
+def load_json(path):
+    """Read a saved template file, or an empty dict if it does not exist."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def parse_target(text):
+    """Parse a ``LOOT_PATH=COUNT`` target."""
+    loot_path, separator, count = text.rpartition("=")
+    if not separator or not count.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected LOOT_PATH=COUNT, got '{text}'.")
+    return loot_path, int(count)
+
+
+def print_click(x, y):
+    """Stand-in for pyautogui.click in dry runs."""
+    print(f"Click at ({x}, {y})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("template", help="Name of a template in automation_templates.json")
+    parser.add_argument("--loot", help="Name of a template in loot_detection_templates.json")
+    parser.add_argument("--target", type=parse_target, action="append", default=[], metavar="LOOT_PATH=COUNT",
+                        help="Stop once a loot template was seen this many times (repeatable)")
+    parser.add_argument("--capture-backend", choices=list(CAPTURE_BACKENDS), default=MssCaptureBackend.name)
+    parser.add_argument("--replay-dir", help="Recorded frames for the replay backend")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Confidence threshold")
+    parser.add_argument("--fps", type=float, default=TARGET_FPS, help="Target frame rate")
+    parser.add_argument("--coarse-to-fine", action="store_true", help="Match coarse-to-fine instead of exhaustively")
+    parser.add_argument("--downscale", type=int, default=1, help="Match at 1/N resolution")
+    parser.add_argument("--click-all", action="store_true", help="Click every instance of a template")
+    parser.add_argument("--learn-roi", action="store_true", help="Narrow searches to where templates were found")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--dry-run", action="store_true", help="Print clicks instead of performing them")
+    parser.add_argument("--timings-csv", help="Save per-stage timings and histograms to this CSV file")
+    args = parser.parse_args()
+
+    automation_templates = load_json("automation_templates.json")
+    if args.template not in automation_templates:
+        print(f"Unknown automation template '{args.template}'.")
+        return 1
+    loot_notifications = {}
+    if args.loot:
+        loot_detection_templates = load_json("loot_detection_templates.json")
+        if args.loot not in loot_detection_templates:
+            print(f"Unknown loot detection template '{args.loot}'.")
+            return 1
+        loot_notifications = loot_detection_templates[args.loot]
+
+    if args.capture_backend == QtCaptureBackend.name:
+        from PyQt5.QtWidgets import QApplication
+        app = QApplication(sys.argv[:1])  # QScreen needs a live application
+    try:
+        capture_backend = create_capture_backend(args.capture_backend, args.replay_dir)
+    except Exception as e:
+        print(f"Could not create the {args.capture_backend} capture backend: {e}")
+        return 1
+    match_pool = MatchPool()
+    scheduler = AutomationScheduler(capture_backend, click=print_click if args.dry_run else None, target_fps=args.fps)
+    template_stats = TemplateStatistics("template_stats.json")
+    group = HeadlessAutomationGroup(
+        args.template, args.threshold, capture_backend=capture_backend, match_pool=match_pool,
+        scheduler=scheduler, template_stats=template_stats
+    )
+    group.load_automation_template(automation_templates[args.template])
+    group.loot_templates = list(loot_notifications)
+    group.matcher.load_templates(group.loot_templates)
+    group.loot_targets = dict(args.target)
+    if args.coarse_to_fine:
+        group.matcher.match_mode = MATCH_MODE_COARSE_TO_FINE
+    group.matcher.downscale = args.downscale
+    group.matcher.auto_learn_roi = args.learn_roi
+    group.click_all_instances = args.click_all
+    if not group.templates and not group.states:
+        print(f"Automation template '{args.template}' has no templates.")
+        return 1
+
+    start = time.perf_counter()
+    group.start()
+    try:
+        while group.running:
+            if args.duration is not None and time.perf_counter() - start >= args.duration:
+                break
+            time.sleep(STATUS_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        group.stop()
+        scheduler.stop()  # Let a running tick finish before the pool and the backend go away
+        elapsed = time.perf_counter() - start
+        print(
+            f"Ran {elapsed:.1f} s: {group.frames_processed} frames matched, "
+            f"{group.frames_skipped} reused"
+        )
+        for loot_path, count in group.loot_counts.items():
+            print(f"{loot_path}: {count}")
+        incremental_matcher = group.matcher.incremental_matcher
+        matched_fraction = incremental_matcher.matched_fraction() if incremental_matcher is not None else None
+        if matched_fraction is not None:
+            print(f"Incremental matching re-matched {matched_fraction:.1%} of the searched pixels")
+        print(group.profiler.report())
+        if args.timings_csv:
+            group.profiler.export_csv(args.timings_csv)
+        match_pool.shutdown()
+        capture_backend.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
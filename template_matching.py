@@ -0,0 +1,1172 @@
+"""Template loading and matching helpers used by the automation window.
+
+Only OpenCV and NumPy are imported here so the matching code can be used and
+measured without PyQt5. ``Matcher`` is the entry point: it loads templates and
+returns their hits in a Frame or a plain NumPy screenshot.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+DEFAULT_SCALES = tuple(float(scale) for scale in np.linspace(0.95, 1.05, 3))
+COARSE_FACTOR = 4  # Coarse pass runs at 1/4 resolution
+COARSE_MARGIN = 0.15  # How far below the threshold a coarse score may be and still get refined
+COARSE_CANDIDATES = 5  # Coarse peaks refined at full resolution, per scale
+MIN_COARSE_TEMPLATE_SIZE = 8  # Smaller downsampled templates are matched exhaustively instead
+NMS_OVERLAP = 0.3  # Hits overlapping a better one by more than this (IoU) are the same instance
+ROI_PADDING = 0.5  # Learned search regions extend this many template sizes past every hit
+ROI_FULL_PROBE_INTERVAL = 10  # Misses inside a learned region before one full-desktop search
+TIMING_HISTORY = 200  # Task timings kept per label by MatchPool
+DIRTY_TILE_SIZE = 64  # Incremental matching compares frames in 64x64 pixel tiles
+INCREMENTAL_ENTRIES = 256  # Template/area pairs whose hits IncrementalMatcher remembers
+INCREMENTAL_MAX_BYTES = 256 * 1024 * 1024  # Most bytes the stored images of searched areas may take up
+STATS_MIN_ATTEMPTS = 20  # Matches before a template's hit rate is trusted
+RARE_HIT_RATE = 0.02  # Templates found less often than this are only probed now and then...
+RARE_PROBE_INTERVAL = 5  # ...once every this many frames
+
+MATCH_MODE_EXHAUSTIVE = "exhaustive"
+MATCH_MODE_COARSE_TO_FINE = "coarse_to_fine"
+
+_frame_counter = itertools.count(1)
+
+
+class Frame:
+    """A single grayscale capture of the desktop, matched against every template in a tick.
+
+    ``regions`` holds one ``(offset_x, offset_y, grayscale_array)`` entry per captured
+    area, with offsets in desktop coordinates. Every frame gets an increasing ``seq``
+    number so matches taken from an older frame can be recognised as stale.
+    ``timings`` collects the seconds spent on each stage of producing the frame.
+    """
+
+    def __init__(self, regions, timestamp=None, timings=None):
+        self.seq = next(_frame_counter)
+        self.regions = regions
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.timings = timings if timings is not None else {}  # {"capture": seconds, "gray": ..., "resize": ...}
+        self._coarse_regions = {}  # {factor: [downsampled grayscale arrays]}
+        self._signature = None
+
+    def coarse_regions(self, factor=COARSE_FACTOR):
+        """Return every region downsampled by ``factor``, computed once per frame."""
+        coarse = self._coarse_regions.get(factor)
+        if coarse is None:
+            start = time.perf_counter()
+            coarse = [downsample(gray, factor) for _, _, gray in self.regions]
+            self._coarse_regions[factor] = coarse
+            add_timing(self.timings, "resize", start)
+        return coarse
+
+    def signature(self):
+        """Return a cheap fingerprint of the frame for telling whether the screen changed."""
+        if self._signature is None:
+            # The cached coarse copies, which coarse-to-fine matching needs anyway, are compared pixel for pixel
+            self._signature = tuple(
+                (offset_x, offset_y, gray.shape, coarse)
+                for (offset_x, offset_y, gray), coarse in zip(self.regions, self.coarse_regions())
+            )
+        return self._signature
+
+
+def signatures_match(signature, other):
+    """Whether two frame signatures cover the same areas with identical coarse copies."""
+    if signature is None or other is None or len(signature) != len(other):
+        return False
+    for (offset_x, offset_y, shape, coarse), (other_x, other_y, other_shape, other_coarse) in zip(signature, other):
+        if (offset_x, offset_y, shape) != (other_x, other_y, other_shape) or not np.array_equal(coarse, other_coarse):
+            return False
+    return True
+
+
+def add_timing(timings, stage, start):
+    """Add the seconds since ``start`` to ``timings[stage]``; does nothing when ``timings`` is None."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def downsample(gray, factor):
+    """Shrink an image by an integer factor with area averaging."""
+    if factor == 1:
+        return gray
+    height, width = gray.shape[:2]
+    size = (max(1, width // factor), max(1, height // factor))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+# One row per match: centre (x, y) in image coordinates, matched size, score and template scale
+HIT_DTYPE = np.dtype([
+    ("x", np.int32), ("y", np.int32), ("width", np.int32), ("height", np.int32),
+    ("score", np.float32), ("scale", np.float32),
+])
+NO_HITS = np.zeros(0, dtype=HIT_DTYPE)
+
+
+def warm_up():
+    """Run one tiny match so OpenCV's one-time setup is not paid by the first real match."""
+    gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+    match_exhaustive(gray, [(1.0, gray[4:8, 4:8].copy())], 1.0)
+
+
+def match_scores(gray, template, timings=None):
+    """Run cv2.matchTemplate, adding its duration to ``timings["match"]`` when a dict is given."""
+    start = time.perf_counter()
+    result = cv2.matchTemplate(gray, template, cv2.TM_CCOEFF_NORMED)
+    add_timing(timings, "match", start)
+    return result
+
+
+def match_exhaustive(gray, scaled_templates, threshold, timings=None):
+    """Match every scaled template over the whole image and return all hits at or above threshold.
+
+    The match functions add the seconds spent in cv2.matchTemplate to
+    ``timings["match"]`` and those spent turning score maps into hits to
+    ``timings["collect"]`` when a ``timings`` dict is given.
+    """
+    hits = []
+    for scale, template in scaled_templates:
+        height, width = template.shape
+        if height > gray.shape[0] or width > gray.shape[1]:
+            continue
+        result = match_scores(gray, template, timings)
+        hits.append(collect_hits(result, threshold, width, height, scale, timings=timings))
+    return concatenate_hits(hits)
+
+
+def match_coarse_to_fine(gray, coarse_gray, scaled_templates, coarse_templates, threshold,
+                         factor=COARSE_FACTOR, max_candidates=COARSE_CANDIDATES, timings=None):
+    """Return all hits at or above threshold, searching a downsampled image first.
+
+    The coarse pass picks the best ``max_candidates`` peaks per scale, and only a
+    small window around each of them is matched at full resolution. Templates
+    that become too small when downsampled are matched over the whole image.
+    """
+    hits = []
+    image_height, image_width = gray.shape
+    pad = 2 * factor
+    for (scale, template), (_, coarse_template) in zip(scaled_templates, coarse_templates):
+        height, width = template.shape
+        if height > image_height or width > image_width:
+            continue
+        coarse_height, coarse_width = coarse_template.shape
+        if (min(coarse_height, coarse_width) < MIN_COARSE_TEMPLATE_SIZE
+                or coarse_height > coarse_gray.shape[0] or coarse_width > coarse_gray.shape[1]):
+            windows = [(0, 0, image_width, image_height)]
+        else:
+            coarse_result = match_scores(coarse_gray, coarse_template, timings)
+            windows = []
+            for x, y in _coarse_peaks(coarse_result, threshold - COARSE_MARGIN, max_candidates,
+                                      coarse_width, coarse_height, timings):
+                left = max(0, x * factor - pad)
+                top = max(0, y * factor - pad)
+                right = min(image_width, x * factor + width + pad)
+                bottom = min(image_height, y * factor + height + pad)
+                if right - left >= width and bottom - top >= height:
+                    windows.append((left, top, right, bottom))
+        for left, top, right, bottom in windows:
+            result = match_scores(gray[top:bottom, left:right], template, timings)
+            hits.append(collect_hits(result, threshold, width, height, scale, left, top, timings))
+    # Neighbouring windows can overlap, so the same location may be reported twice
+    return unique_hits(concatenate_hits(hits))
+
+
+def match_in_region(region, coarse_gray, scaled_templates, coarse_templates, roi, threshold, factor=1,
+                    incremental=None, template_path=None, downscale=1, timings=None, frame_seq=None):
+    """Match one template against one captured area, cropped to ``roi``, returning desktop hits.
+
+    ``factor`` above 1 selects coarse-to-fine matching, with ``coarse_gray`` being the
+    area downsampled by that factor and ``coarse_templates`` the matching variants.
+    ``downscale`` above 1 instead matches only at that reduced resolution, with
+    ``coarse_gray`` and ``coarse_templates`` downsampled by ``downscale``; hits are
+    mapped back to full-resolution desktop coordinates. Exhaustive matching goes
+    through ``incremental`` (an IncrementalMatcher) when one is given, which
+    remembers results under ``template_path`` and needs the area's ``frame_seq``.
+    Stage durations go to ``timings`` as in match_exhaustive.
+    """
+    offset_x, offset_y, gray = region
+    # The crop must line up with the pixels of whichever downsampled copy is searched
+    bounds = crop_bounds(gray.shape[1], gray.shape[0], offset_x, offset_y, roi, downscale if downscale > 1 else factor)
+    if bounds is None:
+        return NO_HITS
+    left, top, right, bottom = bounds
+    gray = gray[top:bottom, left:right]
+    if downscale > 1:
+        small_gray = coarse_gray[top // downscale:bottom // downscale, left // downscale:right // downscale]
+        if incremental is not None:
+            area_key = (offset_x + left, offset_y + top, small_gray.shape, downscale)
+            hits = incremental.match(
+                template_path, area_key, frame_seq, small_gray, coarse_templates, threshold, timings
+            )
+        else:
+            hits = match_exhaustive(small_gray, coarse_templates, threshold, timings)
+        hits = upscale_hits(hits, downscale)
+    elif factor > 1:
+        coarse_gray = coarse_gray[top // factor:bottom // factor, left // factor:right // factor]
+        hits = match_coarse_to_fine(
+            gray, coarse_gray, scaled_templates, coarse_templates, threshold, factor, timings=timings
+        )
+    elif incremental is not None:
+        area_key = (offset_x + left, offset_y + top, gray.shape, 1)
+        hits = incremental.match(template_path, area_key, frame_seq, gray, scaled_templates, threshold, timings)
+    else:
+        hits = match_exhaustive(gray, scaled_templates, threshold, timings)
+    return offset_hits(hits, offset_x + left, offset_y + top)
+
+
+def dirty_rectangles(previous, gray, tile_size=DIRTY_TILE_SIZE):
+    """Return ``(left, top, right, bottom)`` boxes around the tiles where two equally sized images differ."""
+    height, width = gray.shape
+    changed = cv2.absdiff(previous, gray)
+    # Largest difference per tile; the last row and column of tiles may be partial
+    tiles = np.maximum.reduceat(changed, np.arange(0, height, tile_size), axis=0)
+    tiles = np.maximum.reduceat(tiles, np.arange(0, width, tile_size), axis=1)
+    count, _, stats, _ = cv2.connectedComponentsWithStats((tiles > 0).astype(np.uint8), connectivity=8)
+    rectangles = []
+    for tile_x, tile_y, tile_width, tile_height, _ in stats[1:]:  # Component 0 is the unchanged background
+        rectangles.append((
+            tile_x * tile_size, tile_y * tile_size,
+            min(width, (tile_x + tile_width) * tile_size), min(height, (tile_y + tile_height) * tile_size),
+        ))
+    return rectangles
+
+
+def match_dirty_rectangles(gray, scaled_templates, threshold, rectangles, previous_hits, timings=None):
+    """Exhaustive matching that only recomputes scores affected by ``rectangles``.
+
+    Every score whose template window overlaps a dirty rectangle is matched again;
+    ``previous_hits`` from the last exhaustive match of the same template supply
+    the rest. The hits come out in the same order as ``match_exhaustive`` gives.
+    """
+    hits = []
+    for scale, template in scaled_templates:
+        height, width = template.shape
+        if height > gray.shape[0] or width > gray.shape[1]:
+            continue
+        result_width = gray.shape[1] - width + 1
+        result_height = gray.shape[0] - height + 1
+        windows = []  # Areas of the score map to recompute, padded by the template size
+        for left, top, right, bottom in rectangles:
+            window = (max(0, left - width + 1), max(0, top - height + 1),
+                      min(result_width, right), min(result_height, bottom))
+            if window[2] > window[0] and window[3] > window[1]:
+                windows.append(window)
+
+        kept = previous_hits[previous_hits["scale"] == np.float32(scale)]
+        hit_x = kept["x"] - width // 2  # Back to the top-left corner, like a score map index
+        hit_y = kept["y"] - height // 2
+        stale = np.zeros(len(kept), dtype=bool)
+        for left, top, right, bottom in windows:
+            stale |= (hit_x >= left) & (hit_x < right) & (hit_y >= top) & (hit_y < bottom)
+        scale_hits = [kept[~stale]]
+        for left, top, right, bottom in windows:
+            result = match_scores(gray[top:bottom + height - 1, left:right + width - 1], template, timings)
+            scale_hits.append(collect_hits(result, threshold, width, height, scale, left, top, timings))
+        # Windows can overlap; keep the row-major order a full score map would give
+        scale_hits = unique_hits(concatenate_hits(scale_hits))
+        hits.append(scale_hits[np.lexsort((scale_hits["x"], scale_hits["y"]))])
+    return concatenate_hits(hits)
+
+
+class _IncrementalArea:
+    """The latest image of one searched area and where it differs from the image before."""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Held while a new frame's image is compared and stored
+        self.seq = None  # Frame the stored image comes from...
+        self.previous_seq = None  # ...and the frame stored before it
+        self.gray = None
+        self.nbytes = 0  # Bytes of gray counted in IncrementalMatcher._stored_bytes
+        self.rectangles = None  # Dirty rectangles between the two frames, None if they cannot be compared
+
+
+class IncrementalMatcher:
+    """Exhaustive matching that re-matches only the parts of an area that changed.
+
+    For every searched area it keeps the latest image and, once per frame, the
+    tiles where it differs from the image before (see dirty_rectangles). For
+    every template in an area it keeps only the hits and the frame they were
+    found in. A template last matched in the previous frame re-matches just the
+    dirty tiles (grown by the template size), so a mostly static screen with a
+    small animated part costs a fraction of a full match. Only hits are kept
+    rather than whole score maps, which would take tens of megabytes per
+    template and scale on a large desktop. An area cut out of a frame is stored
+    as a copy, so the rest of that frame can be freed.
+    """
+
+    def __init__(self, tile_size=DIRTY_TILE_SIZE, max_entries=INCREMENTAL_ENTRIES, max_bytes=INCREMENTAL_MAX_BYTES):
+        self.tile_size = tile_size
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._areas = OrderedDict()  # {(left, top, shape, downscale): _IncrementalArea}, least recently used first
+        self._entries = OrderedDict()  # {(template_path, area_key): (scaled_templates, threshold, frame_seq, hits)}
+        self._stored_bytes = 0  # Bytes of the images in _areas
+        self._lock = threading.Lock()
+        self.matched_pixels = 0  # Image pixels matched again, against...
+        self.total_pixels = 0  # ...the pixels a full match would have covered
+
+    def match(self, template_path, area_key, frame_seq, gray, scaled_templates, threshold, timings=None):
+        """Return the hits of ``scaled_templates`` in ``gray``, the area ``area_key`` of frame ``frame_seq``."""
+        seq, previous_seq, rectangles = self._update_area(area_key, frame_seq, gray)
+        key = (template_path, area_key)
+        with self._lock:
+            entry = self._entries.get(key)
+        # Reloaded templates, other scales or another threshold invalidate the stored hits
+        if entry is None or entry[0] is not scaled_templates or entry[1] != threshold:
+            hits = match_exhaustive(gray, scaled_templates, threshold, timings)
+            matched_pixels = gray.size
+        elif entry[2] == seq:
+            hits = entry[3]  # Matched in this very frame already
+            matched_pixels = 0
+        elif entry[2] == previous_seq and rectangles is not None:
+            hits = match_dirty_rectangles(gray, scaled_templates, threshold, rectangles, entry[3], timings)
+            matched_pixels = sum((right - left) * (bottom - top) for left, top, right, bottom in rectangles)
+        else:
+            hits = match_exhaustive(gray, scaled_templates, threshold, timings)  # Skipped a frame in between
+            matched_pixels = gray.size
+        with self._lock:
+            self._entries[key] = (scaled_templates, threshold, seq, hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.matched_pixels += matched_pixels
+            self.total_pixels += gray.size
+        return hits
+
+    def matched_fraction(self):
+        """The share of pixels matched again instead of reused, or None before the first match."""
+        with self._lock:
+            return self.matched_pixels / self.total_pixels if self.total_pixels else None
+
+    def _update_area(self, area_key, frame_seq, gray):
+        """Store the area's image of a new frame once; return ``(frame_seq, previous_seq, dirty_rectangles)``."""
+        with self._lock:
+            area = self._areas.get(area_key)
+            if area is None:
+                area = self._areas[area_key] = _IncrementalArea()
+            self._areas.move_to_end(area_key)
+        with area.lock:
+            if area.seq != frame_seq:
+                area.rectangles = None
+                if area.gray is not None and area.gray.shape == gray.shape:
+                    area.rectangles = dirty_rectangles(area.gray, gray, self.tile_size)
+                if gray.base is not None and gray.nbytes < np.asarray(gray.base).nbytes:
+                    gray = gray.copy()  # A view would keep the whole frame it was cut from alive
+                area.previous_seq, area.seq, area.gray = area.seq, frame_seq, gray
+                with self._lock:
+                    if self._areas.get(area_key) is area:
+                        self._stored_bytes += gray.nbytes - area.nbytes
+                        area.nbytes = gray.nbytes
+                    while self._stored_bytes > self.max_bytes and len(self._areas) > 1:
+                        _, evicted = self._areas.popitem(last=False)
+                        self._stored_bytes -= evicted.nbytes
+            return area.seq, area.previous_seq, area.rectangles
+
+    def clear(self):
+        """Forget every stored match."""
+        with self._lock:
+            self._areas.clear()
+            self._entries.clear()
+            self._stored_bytes = 0
+
+
+def collect_hits(result, threshold, width, height, scale, offset_x=0, offset_y=0, timings=None):
+    """Turn every score in a cv2.matchTemplate result at or above threshold into a hit."""
+    start = time.perf_counter()
+    ys, xs = np.nonzero(result >= threshold)
+    hits = np.empty(len(xs), dtype=HIT_DTYPE)
+    hits["x"] = xs + (width // 2 + offset_x)
+    hits["y"] = ys + (height // 2 + offset_y)
+    hits["width"] = width
+    hits["height"] = height
+    hits["score"] = result[ys, xs]
+    hits["scale"] = scale
+    add_timing(timings, "collect", start)
+    return hits
+
+
+def concatenate_hits(hit_arrays):
+    """Join hit arrays, keeping their order."""
+    hit_arrays = [hits for hits in hit_arrays if len(hits)]
+    if not hit_arrays:
+        return NO_HITS
+    return np.concatenate(hit_arrays)
+
+
+def upscale_hits(hits, factor):
+    """Map hits found in an image downsampled by ``factor`` back to full-resolution coordinates."""
+    hits = hits.copy()
+    left = (hits["x"] - hits["width"] // 2) * factor
+    top = (hits["y"] - hits["height"] // 2) * factor
+    hits["width"] *= factor
+    hits["height"] *= factor
+    hits["x"] = left + hits["width"] // 2
+    hits["y"] = top + hits["height"] // 2
+    return hits
+
+
+def offset_hits(hits, offset_x, offset_y):
+    """Return a copy of ``hits`` moved by the given offset, e.g. into desktop coordinates."""
+    hits = hits.copy()
+    hits["x"] += offset_x
+    hits["y"] += offset_y
+    return hits
+
+
+def unique_hits(hits):
+    """Drop repeated hits at the same location and scale, keeping the first."""
+    if len(hits) < 2:
+        return hits
+    _, first = np.unique(hits[["x", "y", "scale"]], return_index=True)
+    return hits[np.sort(first)]
+
+
+def topmost_hit(hits):
+    """Return the hit closest to the top of the screen (first one on ties), or None."""
+    if not len(hits):
+        return None
+    return hits[np.argmin(hits["y"])]
+
+
+def best_hit(hits):
+    """Return the highest scoring hit, or None."""
+    if not len(hits):
+        return None
+    return hits[np.argmax(hits["score"])]
+
+
+def non_max_suppression(hits, overlap=NMS_OVERLAP):
+    """Keep the best scoring hit of every group whose boxes overlap by more than ``overlap`` (IoU)."""
+    if len(hits) < 2:
+        return hits
+    left = hits["x"] - hits["width"] // 2
+    top = hits["y"] - hits["height"] // 2
+    right = left + hits["width"]
+    bottom = top + hits["height"]
+    areas = hits["width"].astype(np.int64) * hits["height"]
+    order = np.argsort(-hits["score"], kind="stable")
+    keep = []
+    while len(order):
+        current = order[0]
+        keep.append(current)
+        rest = order[1:]
+        inter_width = np.minimum(right[current], right[rest]) - np.maximum(left[current], left[rest])
+        inter_height = np.minimum(bottom[current], bottom[rest]) - np.maximum(top[current], top[rest])
+        intersection = np.clip(inter_width, 0, None).astype(np.int64) * np.clip(inter_height, 0, None)
+        iou = intersection / (areas[current] + areas[rest] - intersection)
+        order = rest[iou <= overlap]
+    return hits[np.sort(keep)]
+
+
+def distinct_instances(hits, overlap=NMS_OVERLAP):
+    """Return one hit per distinct on-screen instance, ordered top to bottom then left to right."""
+    hits = non_max_suppression(hits, overlap)
+    return hits[np.lexsort((hits["x"], hits["y"]))]
+
+
+def _coarse_peaks(result, threshold, max_candidates, width, height, timings=None):
+    # Take the strongest peaks one at a time, blanking each one's neighbourhood
+    start = time.perf_counter()
+    result = result.copy()
+    peaks = []
+    for _ in range(max_candidates):
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        if score < threshold:
+            break
+        peaks.append((x, y))
+        result[max(0, y - height // 2):y + height // 2 + 1, max(0, x - width // 2):x + width // 2 + 1] = -1.0
+    add_timing(timings, "collect", start)
+    return peaks
+
+
+def crop_bounds(width, height, offset_x, offset_y, roi, align=1):
+    """Return the ``(left, top, right, bottom)`` part of a captured area that lies inside ``roi``.
+
+    ``roi`` is ``[x, y, width, height]`` in desktop coordinates, or None for the whole
+    area. The top-left corner is aligned down to ``align`` pixels so a downsampled copy
+    of the area can be cropped the same way. Returns None when there is no overlap.
+    """
+    if roi is None:
+        return 0, 0, width, height
+    x, y, roi_width, roi_height = roi
+    left = max(0, x - offset_x)
+    top = max(0, y - offset_y)
+    right = min(width, x + roi_width - offset_x)
+    bottom = min(height, y + roi_height - offset_y)
+    left -= left % align
+    top -= top % align
+    if right <= left or bottom <= top:
+        return None
+    return left, top, right, bottom
+
+
+def union_bounds(width, height, offset_x, offset_y, rois):
+    """Return the smallest ``(left, top, right, bottom)`` part of an area covering every roi in it.
+
+    ``rois`` of None means the whole area is needed. Returns None when no roi
+    touches the area, so it does not need to be captured at all.
+    """
+    if rois is None:
+        return 0, 0, width, height
+    bounds = [crop_bounds(width, height, offset_x, offset_y, roi) for roi in rois]
+    bounds = [bound for bound in bounds if bound is not None]
+    if not bounds:
+        return None
+    lefts, tops, rights, bottoms = zip(*bounds)
+    return min(lefts), min(tops), max(rights), max(bottoms)
+
+
+def grow_roi(roi, hits, padding=ROI_PADDING):
+    """Return ``roi`` enlarged to cover every hit box plus ``padding`` template sizes around it."""
+    pad_x = (hits["width"] * padding).astype(np.int64)
+    pad_y = (hits["height"] * padding).astype(np.int64)
+    left = int(np.min(hits["x"] - hits["width"] // 2 - pad_x))
+    top = int(np.min(hits["y"] - hits["height"] // 2 - pad_y))
+    right = int(np.max(hits["x"] - hits["width"] // 2 + hits["width"] + pad_x))
+    bottom = int(np.max(hits["y"] - hits["height"] // 2 + hits["height"] + pad_y))
+    if roi is not None:
+        x, y, width, height = roi
+        left, top = min(left, x), min(top, y)
+        right, bottom = max(right, x + width), max(bottom, y + height)
+    return [left, top, right - left, bottom - top]
+
+
+def normalize_scales(scales):
+    """Turn a user supplied scale list into the sorted tuple used as a cache key, or the default if none is positive."""
+    scales = tuple(sorted({round(float(scale), 4) for scale in scales or () if float(scale) > 0}))
+    return scales or DEFAULT_SCALES
+
+
+class CachedTemplate:
+    """A decoded template together with its resized variants, one per scale set."""
+
+    def __init__(self, template_path, mtime, gray):
+        self.path = template_path
+        self.mtime = mtime
+        self.gray = gray
+        self.nbytes = gray.nbytes
+        self.variants = {}  # {(scales_tuple, factor): [(scale, resized_template)]}
+
+    def scaled(self, scales, factor=1):
+        """Return ``(scale, resized_template)`` pairs, resizing only the first time.
+
+        A ``factor`` above 1 additionally shrinks every variant for the coarse pass.
+        """
+        variants = self.variants.get((scales, factor))
+        if variants is None:
+            variants = []
+            for scale in scales:
+                if scale == 1.0 and factor == 1:
+                    variants.append((scale, self.gray))
+                    continue
+                fx = scale / factor
+                # Coarse variants are shrunk the same way as the desktop they are matched against
+                interpolation = cv2.INTER_LINEAR if factor == 1 else cv2.INTER_AREA
+                resized = cv2.resize(self.gray, None, fx=fx, fy=fx, interpolation=interpolation)
+                variants.append((scale, resized))
+                self.nbytes += resized.nbytes
+            self.variants[(scales, factor)] = variants
+        return variants
+
+
+class TemplateStore:
+    """Decoded grayscale templates shared by every automation group.
+
+    Each image is read from disk once and kept in memory until the file changes
+    on disk or it is pushed out of the memory budget (least recently used first).
+    Resized copies for each scale set are cached alongside the template.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {"template_path": CachedTemplate}
+        self._lock = threading.Lock()
+
+    def get(self, template_path):
+        """Return the grayscale template, decoding it only when it is new or changed."""
+        return self._entry(template_path).gray
+
+    def get_scaled(self, template_path, scales=DEFAULT_SCALES, factor=1):
+        """Return the template resized to every scale in ``scales`` as ``(scale, array)`` pairs.
+
+        With ``factor`` above 1 the variants are also shrunk for coarse matching.
+        """
+        scales = normalize_scales(scales)
+        entry = self._entry(template_path)
+        with self._lock:
+            if (scales, factor) in entry.variants:
+                return entry.variants[(scales, factor)]
+            previous_bytes = entry.nbytes
+            variants = entry.scaled(scales, factor)
+            if self._entries.get(template_path) is entry:
+                self.current_bytes += entry.nbytes - previous_bytes
+                self._evict()
+        return variants
+
+    def _entry(self, template_path):
+        mtime = self._file_mtime(template_path)
+        with self._lock:
+            entry = self._entries.get(template_path)
+            if entry is not None and entry.mtime == mtime:
+                self._entries.move_to_end(template_path)
+                self.hits += 1
+                return entry
+
+        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            raise ValueError(f"Template {template_path} could not be loaded.")
+
+        entry = CachedTemplate(template_path, mtime, template)
+        with self._lock:
+            self.misses += 1
+            self._discard(template_path)
+            self._entries[template_path] = entry
+            self.current_bytes += entry.nbytes
+            self._evict()
+        return entry
+
+    def preload(self, template_paths, scales_by_path=None):
+        """Decode and resize templates ahead of time so the automation loop never waits on disk."""
+        scales_by_path = scales_by_path or {}
+        for template_path in template_paths:
+            try:
+                self.get_scaled(template_path, scales_by_path.get(template_path, DEFAULT_SCALES))
+            except ValueError as e:
+                print(f"Error preloading template: {e}")
+
+    def invalidate(self, template_path=None):
+        """Drop one cached template, or all of them when no path is given."""
+        with self._lock:
+            if template_path is None:
+                self._entries.clear()
+                self.current_bytes = 0
+            else:
+                self._discard(template_path)
+
+    def _discard(self, template_path):
+        entry = self._entries.pop(template_path, None)
+        if entry is not None:
+            self.current_bytes -= entry.nbytes
+
+    def _evict(self):
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self.current_bytes -= entry.nbytes
+
+    @staticmethod
+    def _file_mtime(template_path):
+        try:
+            return os.path.getmtime(template_path)
+        except OSError:
+            return None
+
+
+class TemplateStats:
+    """How often one template was found, when it was last seen and how long matching it takes."""
+
+    def __init__(self, attempts=0, hits=0, last_seen=None, total_latency=0.0):
+        self.attempts = attempts
+        self.hits = hits
+        self.last_seen = last_seen  # time.time() of the latest hit
+        self.total_latency = total_latency  # Seconds spent matching over all attempts
+
+    @property
+    def hit_rate(self):
+        """Fraction of attempts that found the template."""
+        return self.hits / self.attempts if self.attempts else 0.0
+
+    @property
+    def average_latency(self):
+        """Seconds one match of the template takes on average."""
+        return self.total_latency / self.attempts if self.attempts else 0.0
+
+    def to_dict(self):
+        """Return the statistics as a JSON-friendly dict."""
+        return {
+            "attempts": self.attempts, "hits": self.hits, "last_seen": self.last_seen,
+            "total_latency": self.total_latency,
+        }
+
+
+class TemplateStatistics:
+    """TemplateStats for every template, used to order and thin out matching, saved as JSON between sessions.
+
+    Templates that usually match are matched first. Once a template has had
+    ``STATS_MIN_ATTEMPTS`` attempts, a hit rate below ``RARE_HIT_RATE`` means it
+    is only probed on every ``RARE_PROBE_INTERVAL``-th frame.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._stats = {}  # {template_path: TemplateStats}
+        self._skipped = {}  # {template_path: frames skipped since the last probe}
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def get(self, template_path):
+        """Return the statistics of a template, empty if it was never matched."""
+        with self._lock:
+            return self._stats.get(template_path) or TemplateStats()
+
+    def record(self, template_path, found, latency):
+        """Count one match attempt of a template."""
+        with self._lock:
+            stats = self._stats.setdefault(template_path, TemplateStats())
+            stats.attempts += 1
+            stats.total_latency += latency
+            if found:
+                stats.hits += 1
+                stats.last_seen = time.time()
+
+    def should_probe(self, template_path):
+        """Whether to match a template this frame; rarely seen ones are only probed every few frames."""
+        with self._lock:
+            stats = self._stats.get(template_path)
+            if stats is None or stats.attempts < STATS_MIN_ATTEMPTS or stats.hit_rate >= RARE_HIT_RATE:
+                return True
+            skipped = self._skipped.get(template_path, 0) + 1
+            if skipped >= RARE_PROBE_INTERVAL:
+                self._skipped[template_path] = 0
+                return True
+            self._skipped[template_path] = skipped
+            return False
+
+    def by_hit_rate(self, template_paths):
+        """Return the paths ordered from most to least often found, keeping the given order on ties."""
+        with self._lock:
+            rates = {path: stats.hit_rate for path, stats in self._stats.items()}
+        return sorted(template_paths, key=lambda path: -rates.get(path, 0.0))
+
+    def reset(self, template_path=None):
+        """Forget the statistics of one template, or of all of them."""
+        with self._lock:
+            if template_path is None:
+                self._stats.clear()
+                self._skipped.clear()
+            else:
+                self._stats.pop(template_path, None)
+                self._skipped.pop(template_path, None)
+
+    def load(self):
+        """Read the statistics saved at ``path``."""
+        with open(self.path, "r") as f:
+            saved = json.load(f)
+        with self._lock:
+            self._stats = {path: TemplateStats(**values) for path, values in saved.items()}
+
+    def save(self):
+        """Write the statistics to ``path``, if there is one."""
+        if self.path is None:
+            return
+        with self._lock:
+            saved = {path: stats.to_dict() for path, stats in self._stats.items()}
+        with open(self.path, "w") as f:
+            json.dump(saved, f, indent=4)
+
+
+class MatchPool:
+    """Long-lived worker threads for template matching, shared by every automation group.
+
+    cv2.matchTemplate releases the GIL, so threads run matches in parallel. The pool
+    records how long every task took, grouped by the label it was submitted with.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="match")
+        self._timings = {}  # {label: deque of task durations in seconds}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label=None):
+        """Run ``fn(*args)`` on the pool and return its Future."""
+        return self._executor.submit(self._timed, label, fn, *args)
+
+    def map(self, fn, iterable, label=None):
+        """Run ``fn`` over ``iterable`` on the pool and return the results in order."""
+        futures = [self.submit(fn, item, label=label) for item in iterable]
+        return [future.result() for future in futures]
+
+    def timings(self, label):
+        """Return the recent task durations (seconds) recorded for ``label``."""
+        with self._lock:
+            return list(self._timings.get(label, ()))
+
+    def timing_summary(self):
+        """Return ``{label: (task_count, mean_seconds, max_seconds)}`` over the recent tasks."""
+        with self._lock:
+            return {
+                label: (len(durations), sum(durations) / len(durations), max(durations))
+                for label, durations in self._timings.items() if durations
+            }
+
+    def shutdown(self, wait=False):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=wait)
+
+    def _timed(self, label, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                durations = self._timings.get(label)
+                if durations is None:
+                    durations = self._timings[label] = deque(maxlen=TIMING_HISTORY)
+                durations.append(duration)
+
+
+class SharedFrame:
+    """A frame copied once into shared memory so worker processes can read it without pickling.
+
+    Besides the full-resolution regions the block holds the regions downsampled
+    by each of ``coarse_factors`` (by default just the coarse-to-fine ``factor``).
+    ``layout`` has one ``(offset_x, offset_y, shape, start, coarse)`` entry per
+    region, where ``coarse`` maps each factor to the ``(shape, start)`` of its copy.
+    """
+
+    def __init__(self, frame, factor=1, coarse_factors=None):
+        if coarse_factors is None:
+            coarse_factors = [factor] if factor > 1 else []
+        coarse_factors = sorted(coarse_factors)
+        coarse_by_factor = {coarse_factor: frame.coarse_regions(coarse_factor) for coarse_factor in coarse_factors}
+        arrays = [gray for _, _, gray in frame.regions]
+        for coarse_regions in coarse_by_factor.values():
+            arrays.extend(coarse_regions)
+        size = max(1, sum(array.nbytes for array in arrays))
+        self.seq = frame.seq
+        self.factor = factor
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.layout = []
+        position = 0
+        for index, (offset_x, offset_y, gray) in enumerate(frame.regions):
+            start = position
+            position = self._copy(gray, position)
+            coarse = {}
+            for coarse_factor, coarse_regions in coarse_by_factor.items():
+                coarse_gray = coarse_regions[index]
+                coarse[coarse_factor] = (coarse_gray.shape, position)
+                position = self._copy(coarse_gray, position)
+            self.layout.append((offset_x, offset_y, gray.shape, start, coarse))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _copy(self, array, position):
+        view = np.ndarray(array.shape, dtype=np.uint8, buffer=self.shm.buf, offset=position)
+        view[:] = array
+        return position + array.nbytes
+
+    def close(self):
+        """Free the shared block; call once every task using it has finished."""
+        self.shm.close()
+        self.shm.unlink()
+
+
+# Worker process state: templates are decoded once per process and reused for every task
+_worker_store = None
+_worker_shm = None
+
+
+def _init_process_worker(template_paths):
+    global _worker_store
+    _worker_store = TemplateStore()
+    _worker_store.preload(template_paths)
+
+
+def _attach_shared_memory(name):
+    global _worker_shm
+    if _worker_shm is not None and _worker_shm.name == name:
+        return _worker_shm
+    if _worker_shm is not None:
+        _worker_shm.close()
+    # Workers share the parent's resource tracker, so attaching does not take ownership;
+    # the parent unlinks the block in SharedFrame.close()
+    _worker_shm = shared_memory.SharedMemory(name=name)
+    return _worker_shm
+
+
+def _match_shared(shm_name, region_layout, template_path, scales, roi, threshold, factor, downscale=1):
+    offset_x, offset_y, shape, start, coarse = region_layout
+    shm = _attach_shared_memory(shm_name)
+    gray = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=start)
+    coarse_gray = None
+    scaled_templates = _worker_store.get_scaled(template_path, scales)
+    coarse_templates = None
+    reduction = downscale if downscale > 1 else factor  # A template's own downscale replaces coarse-to-fine
+    if reduction > 1:
+        coarse_shape, coarse_start = coarse[reduction]
+        coarse_gray = np.ndarray(coarse_shape, dtype=np.uint8, buffer=shm.buf, offset=coarse_start)
+        coarse_templates = _worker_store.get_scaled(template_path, scales, reduction)
+    timings = {}
+    hits = match_in_region(
+        (offset_x, offset_y, gray), coarse_gray, scaled_templates, coarse_templates, roi, threshold, factor,
+        downscale=downscale, timings=timings
+    )
+    del gray, coarse_gray  # Drop the views so the block can be closed on the next frame
+    return hits, timings
+
+
+class ProcessMatchPool:
+    """Worker processes for template matching, for template sets too large for one process.
+
+    Frames reach the workers through shared memory (see SharedFrame) and each worker
+    keeps its own decoded copy of every template, so only small job descriptions
+    and hit arrays cross the process boundary.
+    """
+
+    def __init__(self, max_workers=None, template_paths=()):
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_process_worker,
+            initargs=(list(template_paths),),
+        )
+
+    def share_frame(self, frame, factor=1, coarse_factors=None):
+        """Copy a frame and its downsampled copies into shared memory; close the result once its tasks are done."""
+        return SharedFrame(frame, factor, coarse_factors)
+
+    def submit(self, shared_frame, index, template_path, scales, roi, threshold, downscale=1):
+        """Match a template against region ``index`` of a shared frame; returns a Future of ``(hits, timings)``."""
+        return self._executor.submit(
+            _match_shared, shared_frame.name, shared_frame.layout[index], template_path,
+            tuple(scales), roi, threshold, shared_frame.factor, downscale
+        )
+
+    def shutdown(self, wait=False):
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def as_frame(image):
+    """Wrap a screenshot array (grayscale, BGR or BGRA) as a Frame whose top-left corner is at ``(0, 0)``."""
+    if isinstance(image, Frame):
+        return image
+    image = np.asarray(image)
+    if image.ndim == 3:
+        code = cv2.COLOR_BGRA2GRAY if image.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+        image = cv2.cvtColor(image, code)
+    return Frame([(0, 0, image)])
+
+
+class Matcher:
+    """Finds templates in frames or NumPy screenshots; the matching engine behind every automation group.
+
+    ``template_settings`` holds per-template options (``"scales"``, ``"downscale"``,
+    ``"roi"`` and the ``"learned_roi"`` grown while ``auto_learn_roi`` is on).
+    Matches run on ``match_pool`` threads, or on ``process_pool`` when one is set.
+
+        matcher = Matcher(threshold=0.8)
+        matcher.load_templates(["collect.png"])
+        hits = matcher.match_template(screenshot, "collect.png")
+    """
+
+    def __init__(self, threshold=0.8, match_mode=MATCH_MODE_EXHAUSTIVE, downscale=1, template_store=None,
+                 template_stats=None, match_pool=None, incremental=True):
+        self.threshold = threshold
+        self.match_mode = match_mode
+        self.coarse_factor = COARSE_FACTOR  # Resolution of the coarse pass in coarse-to-fine mode
+        self.downscale = downscale  # Match at 1/N resolution, for templates without their own "downscale" setting
+        self.template_store = template_store if template_store is not None else TemplateStore()
+        self.template_stats = template_stats if template_stats is not None else TemplateStatistics()
+        self.match_pool = match_pool if match_pool is not None else MatchPool()
+        self.max_parallel_matches = self.match_pool.max_workers  # Matches one call runs at once
+        self.process_pool = None  # Worker processes, while process-pool matching is enabled
+        self.match_lock = threading.Lock()  # Held by match(), so a replaced process pool can wait until it is unused
+        # Exhaustive matches only redo what changed on screen since the same template was last matched
+        self.incremental_matcher = IncrementalMatcher() if incremental else None
+        self.template_settings = {}  # {"template_path": {"scales": [...], "downscale": N, "roi": [...], ...}}
+        self.auto_learn_roi = False  # Narrow each template's search to where it has been found before
+        self.roi_misses = {}  # {"template_path": misses inside the learned region since the last hit}
+        self.profiler = None  # Gets the matchTemplate and hit collection time of every match() call
+
+    def load_templates(self, template_paths, template_settings=None):
+        """Decode templates ahead of the first match, with optional ``{path: settings}`` for them."""
+        if template_settings:
+            self.template_settings.update(template_settings)
+        self.template_store.preload(template_paths, self.template_scales_by_path())
+
+    def template_scales(self, template_path):
+        """Return the scale set a template is matched at."""
+        return self.template_settings.get(template_path, {}).get("scales", DEFAULT_SCALES)
+
+    def template_scales_by_path(self):
+        """Return the configured scale set of every template that has one."""
+        return {path: settings["scales"] for path, settings in self.template_settings.items() if "scales" in settings}
+
+    def template_downscale(self, template_path):
+        """Return the 1/N resolution a template is matched at."""
+        return self.template_settings.get(template_path, {}).get("downscale", self.downscale)
+
+    def search_region(self, template_path):
+        """Return the region a template is searched in, or None for the whole desktop."""
+        settings = self.template_settings.get(template_path, {})
+        if "roi" in settings:
+            return settings["roi"]
+        if self.auto_learn_roi and "learned_roi" in settings:
+            misses = self.roi_misses.get(template_path, 0)
+            if misses and misses % ROI_FULL_PROBE_INTERVAL == 0:
+                return None  # Look everywhere now and then in case the button moved
+            return settings["learned_roi"]
+        return None
+
+    def learn_search_region(self, template_path, hits):
+        """Grow the learned region of a template around where it was just found."""
+        settings = self.template_settings.setdefault(template_path, {})
+        if "roi" in settings:
+            return
+        if len(hits):
+            settings["learned_roi"] = grow_roi(settings.get("learned_roi"), hits)
+            self.roi_misses[template_path] = 0
+        else:
+            self.roi_misses[template_path] = self.roi_misses.get(template_path, 0) + 1
+
+    def match_template(self, image, template_path):
+        """Return every hit of a template in a Frame or screenshot array, in desktop coordinates."""
+        return self.match(image, [template_path])[0]
+
+    def match(self, image, template_paths):
+        """Match several templates against one Frame or screenshot array in parallel.
+
+        Every template/region pair is a separate task on the shared pool (or on the
+        worker processes when process-pool matching is on), with at most
+        ``max_parallel_matches`` of them running at once. Templates that are found
+        most often are submitted first. The result holds one hit array per
+        template, in the order the paths were given.
+        """
+        with self.match_lock:
+            return self._match(image, template_paths)
+
+    def wait_for_match(self):
+        """Block until the match() call running now, if any, has finished."""
+        with self.match_lock:
+            pass
+
+    def _match(self, image, template_paths):
+        frame = as_frame(image)
+        coarse_to_fine = self.match_mode == MATCH_MODE_COARSE_TO_FINE
+        factor = self.coarse_factor if coarse_to_fine else 1
+        coarse_regions = frame.coarse_regions(factor) if coarse_to_fine else [None] * len(frame.regions)
+        slots = threading.BoundedSemaphore(max(1, self.max_parallel_matches))
+        process_pool = self.process_pool
+        shared_frame = None
+        if process_pool is not None:
+            # Share the copies the templates are matched on: their own downscale, else the coarse-to-fine factor
+            downscales = {self.template_downscale(template_path) for template_path in template_paths}
+            coarse_factors = {downscale if downscale > 1 else factor for downscale in downscales} - {1}
+            shared_frame = process_pool.share_frame(frame, factor, coarse_factors)
+        # Seconds spent matching each template over all regions; worker processes are timed from submission
+        latencies = [0.0] * len(template_paths)
+        submitted = [None] * len(template_paths)
+        stage_timings = {"match": 0.0, "collect": 0.0}  # Summed over every task, wherever it ran
+        latency_lock = threading.Lock()
+
+        def add_stage_timings(timings):
+            with latency_lock:
+                for stage, seconds in timings.items():
+                    stage_timings[stage] += seconds
+
+        def match_template_on_screen(job):
+            position, template_path, scaled_templates, coarse_templates, coarse_gray, roi, index, downscale = job
+            start = time.perf_counter()
+            timings = {}
+            try:
+                return match_in_region(
+                    frame.regions[index], coarse_gray, scaled_templates, coarse_templates, roi,
+                    self.threshold, factor, self.incremental_matcher, template_path, downscale, timings, frame.seq
+                )
+            finally:
+                with latency_lock:
+                    latencies[position] += time.perf_counter() - start
+                add_stage_timings(timings)
+                slots.release()
+
+        futures = [None] * len(template_paths)  # [futures, one per region], in template order
+        results = []
+        try:
+            rates = {path: self.template_stats.get(path).hit_rate for path in template_paths}
+            for position in sorted(range(len(template_paths)), key=lambda position: -rates[template_paths[position]]):
+                template_path = template_paths[position]
+                downscale = self.template_downscale(template_path)
+                try:
+                    scales = self.template_scales(template_path)
+                    if shared_frame is None:
+                        scaled_templates = self.template_store.get_scaled(template_path, scales)  # Resized once
+                        coarse_templates = None
+                        small_regions = coarse_regions
+                        if downscale > 1:
+                            coarse_templates = self.template_store.get_scaled(template_path, scales, downscale)
+                            small_regions = frame.coarse_regions(downscale)  # Downsampled once per frame
+                        elif coarse_to_fine:
+                            coarse_templates = self.template_store.get_scaled(template_path, scales, factor)
+                except Exception as e:
+                    print(f"Error matching {template_path}: {e}")
+                    continue
+                roi = self.search_region(template_path)
+                template_futures = []
+                submitted[position] = time.perf_counter()
+                for index in range(len(frame.regions)):
+                    slots.acquire()
+                    try:
+                        if shared_frame is not None:
+                            future = process_pool.submit(
+                                shared_frame, index, template_path, scales, roi, self.threshold, downscale
+                            )
+                            future.add_done_callback(lambda _: slots.release())
+                        else:
+                            job = (
+                                position, template_path, scaled_templates, coarse_templates, small_regions[index],
+                                roi, index, downscale
+                            )
+                            future = self.match_pool.submit(match_template_on_screen, job, label=template_path)
+                    except BaseException:
+                        slots.release()  # The task never started, so nothing else frees its slot
+                        raise
+                    template_futures.append(future)
+                futures[position] = template_futures
+
+            for position, (template_path, template_futures) in enumerate(zip(template_paths, futures)):
+                hits = NO_HITS
+                if template_futures is not None:
+                    try:
+                        region_hits = [future.result() for future in template_futures]
+                        if shared_frame is not None:
+                            for _, timings in region_hits:
+                                add_stage_timings(timings)
+                            region_hits = [hits for hits, _ in region_hits]
+                        hits = concatenate_hits(region_hits)
+                        if self.auto_learn_roi:
+                            self.learn_search_region(template_path, hits)
+                        if shared_frame is not None:
+                            latency = latencies[position] = time.perf_counter() - submitted[position]
+                        else:
+                            with latency_lock:
+                                latency = latencies[position]
+                        self.template_stats.record(template_path, len(hits) > 0, latency)
+                    except Exception as e:
+                        print(f"Error matching {template_path}: {e}")
+                results.append(hits)
+        finally:
+            if shared_frame is not None:
+                # Workers may still be reading the block if submitting a later task failed
+                wait([future for template_futures in futures if template_futures for future in template_futures])
+                shared_frame.close()
+        if self.profiler is not None:
+            # Both stages are timed inside each task, in a thread or a worker process alike
+            self.profiler.record_all(stage_timings)
+        return results